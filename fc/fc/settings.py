@@ -54,6 +54,10 @@ REST_FRAMEWORK = {
     ]
 }
 
+# page sizes of the weathers and locations lists (?page_size=)
+API_PAGE_SIZE = env.int('API_PAGE_SIZE', default=100)
+API_MAX_PAGE_SIZE = env.int('API_MAX_PAGE_SIZE', default=1000)
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -148,3 +152,58 @@ CORS_ORIGIN_WHITELIST = [
      'http://localhost:3000',
      'http://0.0.0.0:8000',
 ]
+
+# Weather refresh
+WEATHER_REFRESH_MAX_WORKERS = env.int('WEATHER_REFRESH_MAX_WORKERS', default=16)
+WEATHER_REFRESH_TIMEOUT = env.float('WEATHER_REFRESH_TIMEOUT', default=5.0)
+WEATHER_REFRESH_INTERVAL = env.int('WEATHER_REFRESH_INTERVAL', default=600)
+WEATHER_SCHEDULER_POLL = env.int('WEATHER_SCHEDULER_POLL', default=30)
+# locations are split into shards leased by the running schedulers
+WEATHER_REFRESH_SHARDS = env.int('WEATHER_REFRESH_SHARDS', default=16)
+WEATHER_SHARD_LEASE = env.int('WEATHER_SHARD_LEASE', default=120)
+# readings younger than this (seconds) are not requested again, the weather
+# API updates its readings every 10 minutes
+WEATHER_FRESHNESS_TTL = env.int('WEATHER_FRESHNESS_TTL', default=600)
+
+# Cache, a shared backend (e.g. CACHE_URL=rediscache://...) coalesces the
+# current weather requests of all processes
+CACHES = {
+    'default': env.cache(default='locmemcache://')
+}
+
+# current weather readings are shared by grid cells of this size (degrees)
+WEATHER_GRID_SIZE = env.float('WEATHER_GRID_SIZE', default=0.05)
+WEATHER_CELL_TTL = env.int('WEATHER_CELL_TTL', default=600)
+WEATHER_CELL_LOCK_TIMEOUT = env.int('WEATHER_CELL_LOCK_TIMEOUT', default=15)
+# the weather API issues a new forecast every hour
+WEATHER_FORECAST_TTL = env.int('WEATHER_FORECAST_TTL', default=3600)
+
+# stored readings are reused by current_weather within this distance (km)
+# if they are not older than the tolerance (seconds), locations use
+# WEATHER_FRESHNESS_TTL as their tolerance
+WEATHER_NEAREST_DISTANCE = env.float('WEATHER_NEAREST_DISTANCE', default=10.0)
+WEATHER_CURRENT_TOLERANCE = env.int('WEATHER_CURRENT_TOLERANCE', default=600)
+
+# current_weather answers from the nearest Location reading within this
+# distance (km), the locations index is synced every
+# WEATHER_LOCATION_INDEX_SYNC seconds
+WEATHER_LOCATION_RADIUS = env.float('WEATHER_LOCATION_RADIUS', default=10.0)
+WEATHER_LOCATION_INDEX_SYNC = env.int('WEATHER_LOCATION_INDEX_SYNC', default=30)
+
+# Weather is partitioned by month, manage_weather_partitions creates
+# partitions ahead of time and drops the ones older than the retention
+WEATHER_PARTITIONS_AHEAD = env.int('WEATHER_PARTITIONS_AHEAD', default=3)
+WEATHER_RETENTION_MONTHS = env.int('WEATHER_RETENTION_MONTHS', default=12)
+
+# raw readings are pruned this many days after being rolled up by
+# rollup_weather, in batches
+WEATHER_RAW_HORIZON = env.int('WEATHER_RAW_HORIZON', default=7)
+WEATHER_PRUNE_BATCH = env.int('WEATHER_PRUNE_BATCH', default=5000)
+
+# Weather API client
+WEATHER_API_POOL_SIZE = env.int('WEATHER_API_POOL_SIZE', default=16)
+WEATHER_API_ASYNC_POOL_SIZE = env.int('WEATHER_API_ASYNC_POOL_SIZE', default=200)
+WEATHER_API_CONNECT_TIMEOUT = env.float('WEATHER_API_CONNECT_TIMEOUT', default=3.05)
+WEATHER_API_READ_TIMEOUT = env.float('WEATHER_API_READ_TIMEOUT', default=10.0)
+WEATHER_API_RETRIES = env.int('WEATHER_API_RETRIES', default=3)
+WEATHER_API_BACKOFF = env.float('WEATHER_API_BACKOFF', default=0.5)
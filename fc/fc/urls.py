@@ -25,6 +25,7 @@ from weatherdashboard.views import (
     WeatherViewSet,
     CountryViewSet
 )
+from weatherdashboard import async_views
 
 
 router = DefaultRouter()
@@ -35,6 +36,10 @@ router.register(r'countries', CountryViewSet, basename="country")
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/v1/', include(router.urls)),
+    path('api/v1/async/locations/add_location/', async_views.add_location),
+    path('api/v1/async/weathers/current_weather/', async_views.current_weather),
+    path('api/v1/async/weathers/forecast_weather/', async_views.forecast_weather),
+    path('api/v1/async/weathers/overview/', async_views.overview),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
     re_path(r'^$', RedirectView.as_view(url=reverse_lazy('api-root'), permanent=False)),
 ]
@@ -14,11 +14,23 @@ class WeatherAdmin(admin.ModelAdmin):
     ]
     ordering = [
         '-unix_last_update',
-        'raw_data__name',
+        'city',
     ]
 admin.site.register(Weather, WeatherAdmin)
 
 
+class ForecastAdmin(admin.ModelAdmin):
+    list_display = [
+        'cell_lat',
+        'cell_lon',
+        'issued_at'
+    ]
+    ordering = [
+        '-issued_at',
+    ]
+admin.site.register(Forecast, ForecastAdmin)
+
+
 class CountryAdmin(admin.ModelAdmin):
     list_display = [
         'name',
@@ -38,6 +50,10 @@ class LocationAdmin(admin.ModelAdmin):
         'get_country_code',
         'get_last_weather'
     ]
+    list_select_related = [
+        'country',
+        'last_weather'
+    ]
     ordering = [
         'city',
         'country__name',
@@ -54,4 +70,45 @@ class LocationAdmin(admin.ModelAdmin):
         if obj.last_weather is None:
             return None
         return obj.last_weather.temperature
-admin.site.register(Location, LocationAdmin)
\ No newline at end of file
+admin.site.register(Location, LocationAdmin)
+
+
+class RefreshShardAdmin(admin.ModelAdmin):
+    list_display = [
+        'number',
+        'worker',
+        'lease_expires_at'
+    ]
+    ordering = [
+        'number'
+    ]
+admin.site.register(RefreshShard, RefreshShardAdmin)
+
+
+class RefreshWorkerAdmin(admin.ModelAdmin):
+    list_display = [
+        'name',
+        'heartbeat_expires_at'
+    ]
+    ordering = [
+        'name'
+    ]
+admin.site.register(RefreshWorker, RefreshWorkerAdmin)
+
+
+class WeatherRollupAdmin(admin.ModelAdmin):
+    list_display = [
+        'location',
+        'bucket',
+        'bucket_start',
+        'temperature_mean',
+        'condition',
+        'samples'
+    ]
+    list_select_related = [
+        'location'
+    ]
+    ordering = [
+        '-bucket_start',
+    ]
+admin.site.register(WeatherRollup, WeatherRollupAdmin)
\ No newline at end of file
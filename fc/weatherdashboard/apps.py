@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WeatherdashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'weatherdashboard'
+
+    def ready(self):
+        from weatherdashboard import signals
@@ -0,0 +1,191 @@
+"""
+Async versions of the weather API bound endpoints, for ASGI servers.
+The weather API is awaited without blocking the event loop and the
+database access runs in a thread through sync_to_async
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotAllowed, JsonResponse
+
+# Django rest
+from rest_framework import serializers
+
+# Services
+from weatherdashboard.services import (
+    validate_location_data,
+    create_location,
+    validate_coordinates_data,
+    find_cell_weather,
+    current_weather_url,
+    store_current_weather,
+    find_forecast,
+    forecast_url,
+    store_forecast,
+    find_overview,
+    store_overview,
+    store_cell_weather
+)
+
+# Grid cache
+from weatherdashboard.grid_cache import (
+    FORECAST,
+    OVERVIEW,
+    get_cell,
+    async_cached_cell_weather
+)
+
+# Weather API
+from weatherdashboard.weather_api import (
+    API_KEY,
+    LOCATION_BY_PLACE_API,
+    async_get_json
+)
+
+
+def validation_error_response(error):
+    return JsonResponse(error.detail, status=400, safe=False)
+
+
+async def add_location(request):
+    """
+    Async version of LocationViewSet.add_location
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        try:
+            data = json.loads(request.body)
+        except ValueError as e:
+            raise serializers.ValidationError(
+                'JSON parse error - {}'.format(e)
+            )
+        await sync_to_async(validate_location_data)(data)
+
+        url = LOCATION_BY_PLACE_API.format(
+            data['city'],
+            data['country_code'],
+            API_KEY
+        )
+        response_data = await async_get_json(url)
+        location_data = await sync_to_async(create_location)(
+            data,
+            response_data
+        )
+    except serializers.ValidationError as e:
+        return validation_error_response(e)
+    return JsonResponse(location_data, status=201)
+# like the rest framework view, the frontend posts without a csrf token
+add_location.csrf_exempt = True
+
+
+async def current_weather(request):
+    """
+    Async version of WeatherViewSet.current_weather
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    data = request.GET
+    try:
+        validate_coordinates_data(data)
+    except serializers.ValidationError as e:
+        return validation_error_response(e)
+    cell = get_cell(data['lat'], data['lon'])
+
+    async def fetch_weather():
+        weather_data = await sync_to_async(find_cell_weather)(data)
+        if weather_data is None:
+            response_data = await async_get_json(current_weather_url(cell))
+            weather_data = await sync_to_async(store_current_weather)(
+                data,
+                response_data
+            )
+        return weather_data
+
+    weather_data = await async_cached_cell_weather(cell, fetch_weather)
+    return JsonResponse(weather_data)
+
+
+async def forecast_weather(request):
+    """
+    Async version of WeatherViewSet.forecast_weather
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    data = request.GET
+    try:
+        validate_coordinates_data(data)
+    except serializers.ValidationError as e:
+        return validation_error_response(e)
+
+    cell = get_cell(data['lat'], data['lon'])
+
+    async def fetch_forecast():
+        forecast_data = await sync_to_async(find_forecast)(cell)
+        if forecast_data is None:
+            response_data = await async_get_json(forecast_url(cell))
+            forecast_data = await sync_to_async(store_forecast)(
+                cell,
+                response_data
+            )
+        return forecast_data
+
+    forecast_data = await async_cached_cell_weather(
+        cell,
+        fetch_forecast,
+        FORECAST
+    )
+    return JsonResponse(forecast_data, safe=False)
+
+
+async def overview(request):
+    """
+    Async version of WeatherViewSet.overview
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    data = request.GET
+    try:
+        validate_coordinates_data(data)
+    except serializers.ValidationError as e:
+        return validation_error_response(e)
+
+    cell = get_cell(data['lat'], data['lon'])
+
+    async def fetch_overview():
+        weather_data, forecast_data = await sync_to_async(find_overview)(
+            data,
+            cell
+        )
+        if weather_data is None or forecast_data is None:
+            response_data = await async_get_json(forecast_url(cell))
+            weather_data, forecast_data = await sync_to_async(store_overview)(
+                data,
+                cell,
+                weather_data,
+                forecast_data,
+                response_data
+            )
+        if weather_data is None:
+            response_data = await async_get_json(current_weather_url(cell))
+            weather_data = await sync_to_async(store_cell_weather)(
+                data,
+                cell,
+                response_data
+            )
+        # incomplete overviews are not cached
+        if weather_data is None or forecast_data is None:
+            return None
+        return {
+            'current_weather': weather_data,
+            'forecast_weather': forecast_data
+        }
+
+    overview_data = await async_cached_cell_weather(
+        cell,
+        fetch_overview,
+        OVERVIEW
+    )
+    if overview_data is None:
+        return JsonResponse({'detail': 'weather API unavailable'}, status=502)
+    return JsonResponse(overview_data)
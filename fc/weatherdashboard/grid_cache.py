@@ -0,0 +1,122 @@
+"""
+Shared cache of current weather readings and forecasts by grid cell
+
+Coordinates are snapped to a grid of WEATHER_GRID_SIZE degrees, so users of
+the same cell share one reading for WEATHER_CELL_TTL seconds and one
+forecast for WEATHER_FORECAST_TTL seconds. Concurrent misses of a cell are
+coalesced: one caller fetches the data while the rest wait for it in the
+cache
+"""
+import asyncio
+import math
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+# seconds between two checks of a cell being fetched by another caller
+WAIT_POLL = 0.05
+
+# kinds of cached data
+CURRENT = 'current'
+FORECAST = 'forecast'
+OVERVIEW = 'overview'
+
+
+def get_cell(lat, lon):
+    """
+    Returns the (lat, lon) center of the grid cell of the coordinates
+    """
+    size = settings.WEATHER_GRID_SIZE
+    return tuple(
+        round(math.floor(float(value) / size) * size + size / 2, 6)
+        for value in (lat, lon)
+    )
+
+
+def cell_key(cell, kind):
+    return 'weather-{}:{}:{}'.format(kind, *cell)
+
+
+def cell_ttl(kind):
+    if kind == FORECAST:
+        return settings.WEATHER_FORECAST_TTL
+    return settings.WEATHER_CELL_TTL
+
+
+def get_cell_weather(cell, kind=CURRENT):
+    return cache.get(cell_key(cell, kind))
+
+
+def set_cell_weather(cell, weather_data, kind=CURRENT):
+    cache.set(cell_key(cell, kind), weather_data, cell_ttl(kind))
+
+
+def acquire_cell(cell, kind=CURRENT):
+    """
+    Returns True if the caller is the only one fetching the cell
+    """
+    return cache.add(
+        cell_key(cell, kind) + ':lock',
+        True,
+        settings.WEATHER_CELL_LOCK_TIMEOUT
+    )
+
+
+def release_cell(cell, kind=CURRENT):
+    cache.delete(cell_key(cell, kind) + ':lock')
+
+
+def cached_cell_weather(cell, fetch, kind=CURRENT):
+    """
+    Returns the cached weather of cell or the one returned by fetch, which
+    is only called by one caller at a time per cell
+    """
+    weather_data = get_cell_weather(cell, kind)
+    if weather_data is not None:
+        return weather_data
+
+    deadline = time.monotonic() + settings.WEATHER_CELL_LOCK_TIMEOUT
+    acquired = acquire_cell(cell, kind)
+    # when the deadline passes the fetching caller is gone, fetch anyway
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(WAIT_POLL)
+        weather_data = get_cell_weather(cell, kind)
+        if weather_data is not None:
+            return weather_data
+        acquired = acquire_cell(cell, kind)
+    try:
+        weather_data = fetch()
+        if weather_data is not None:
+            set_cell_weather(cell, weather_data, kind)
+    finally:
+        if acquired:
+            release_cell(cell, kind)
+    return weather_data
+
+
+async def async_cached_cell_weather(cell, fetch, kind=CURRENT):
+    """
+    Async version of cached_cell_weather, fetch is a coroutine function
+    """
+    weather_data = await sync_to_async(get_cell_weather)(cell, kind)
+    if weather_data is not None:
+        return weather_data
+
+    deadline = time.monotonic() + settings.WEATHER_CELL_LOCK_TIMEOUT
+    acquired = await sync_to_async(acquire_cell)(cell, kind)
+    while not acquired and time.monotonic() < deadline:
+        await asyncio.sleep(WAIT_POLL)
+        weather_data = await sync_to_async(get_cell_weather)(cell, kind)
+        if weather_data is not None:
+            return weather_data
+        acquired = await sync_to_async(acquire_cell)(cell, kind)
+    try:
+        weather_data = await fetch()
+        if weather_data is not None:
+            await sync_to_async(set_cell_weather)(cell, weather_data, kind)
+    finally:
+        if acquired:
+            await sync_to_async(release_cell)(cell, kind)
+    return weather_data
@@ -0,0 +1,158 @@
+"""
+In-process spatial index of the Locations last weather readings
+
+Readings are bucketed in a grid of cells about WEATHER_LOCATION_RADIUS km
+wide, so the nearest location to a point is found by checking the few
+cells around it. The index is synced incrementally from the database,
+loading only the locations whose weather_updated_at is newer than the
+last sync and dropping the deleted ones or those left without a reading
+"""
+import copy
+import datetime
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+# Models
+from weatherdashboard.models import Location
+
+# Serializers
+from weatherdashboard.serializers import WeatherSerializer
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+# seconds of overlap between two syncs, for clock skew between processes
+SYNC_OVERLAP = 5
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """
+    Returns the haversine distance between two points
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2 +
+        math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class LocationIndex:
+    """
+    Grid of the locations last weather readings
+    """
+
+    def __init__(self, radius):
+        self.radius = radius
+        self.cell_size = radius / KM_PER_DEGREE
+        self.lon_cells = math.ceil(360 / self.cell_size)
+        # cell -> set of location ids
+        self.cells = {}
+        # location id -> (cell, lat, lon, unix_last_update, weather_data)
+        self.entries = {}
+        self.synced_at = None
+        self.checked_at = 0
+        self.lock = threading.Lock()
+
+    def get_cell(self, lat, lon):
+        return (
+            math.floor((lat + 90) / self.cell_size),
+            math.floor((lon + 180) / self.cell_size) % self.lon_cells
+        )
+
+    def put(self, location_id, lat, lon, unix_last_update, weather_data):
+        self.remove(location_id)
+        cell = self.get_cell(lat, lon)
+        self.cells.setdefault(cell, set()).add(location_id)
+        self.entries[location_id] = (
+            cell, lat, lon, unix_last_update, weather_data
+        )
+
+    def remove(self, location_id):
+        entry = self.entries.pop(location_id, None)
+        if entry is not None:
+            cell = self.cells[entry[0]]
+            cell.discard(location_id)
+            if not cell:
+                del self.cells[entry[0]]
+
+    def sync(self):
+        """
+        Loads the locations whose last weather changed since the last sync
+        and removes the deleted ones or those without a last weather
+        """
+        now = timezone.now()
+        locations = Location.objects.filter(last_weather__isnull=False)
+        if self.synced_at is not None:
+            location_ids = set(locations.values_list('id', flat=True))
+            for location_id in set(self.entries) - location_ids:
+                self.remove(location_id)
+            locations = locations.filter(
+                weather_updated_at__gte=self.synced_at
+            )
+        locations = locations.select_related('last_weather__payload')
+        for location in locations:
+            weather = location.last_weather
+            self.put(
+                location.id,
+                weather.coordinates.coords[1],
+                weather.coordinates.coords[0],
+                weather.unix_last_update,
+                WeatherSerializer(weather).data
+            )
+        self.synced_at = now - datetime.timedelta(seconds=SYNC_OVERLAP)
+
+    def nearest(self, lat, lon, freshness):
+        """
+        Returns the weather data of the nearest location within radius km
+        with a reading younger than freshness seconds, or None
+        """
+        lat = float(lat)
+        lon = float(lon)
+        with self.lock:
+            if time.monotonic() - self.checked_at > settings.WEATHER_LOCATION_INDEX_SYNC:
+                self.sync()
+                self.checked_at = time.monotonic()
+
+            since = timezone.now() - datetime.timedelta(seconds=freshness)
+            lat_cell, lon_cell = self.get_cell(lat, lon)
+            # a degree of longitude gets shorter towards the poles
+            lon_range = math.ceil(1 / max(math.cos(math.radians(lat)), 0.01))
+            lon_range = min(lon_range, self.lon_cells // 2)
+            nearest_entry = None
+            nearest_distance = self.radius
+            for i in range(lat_cell - 1, lat_cell + 2):
+                for j in range(lon_cell - lon_range, lon_cell + lon_range + 1):
+                    cell = (i, j % self.lon_cells)
+                    for location_id in self.cells.get(cell, ()):
+                        entry = self.entries[location_id]
+                        if entry[3] < since:
+                            continue
+                        distance = distance_km(lat, lon, entry[1], entry[2])
+                        if distance <= nearest_distance:
+                            nearest_entry = entry
+                            nearest_distance = distance
+        if nearest_entry is None:
+            return None
+        weather_data = copy.deepcopy(nearest_entry[4])
+        weather_data['derived'] = True
+        weather_data['derived_distance'] = nearest_distance
+        return weather_data
+
+
+location_index = LocationIndex(settings.WEATHER_LOCATION_RADIUS)
+
+
+def find_location_weather(data):
+    """
+    Returns the weather data of the nearest location to lat, lon with a
+    reading not older than WEATHER_CURRENT_TOLERANCE seconds, or None
+    """
+    return location_index.nearest(
+        data['lat'],
+        data['lon'],
+        settings.WEATHER_CURRENT_TOLERANCE
+    )
@@ -2015,12 +2015,12 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         for country in all_countries_data:
-            new_country = Country.objects.create(
-                name=country['countryName'],
-                code=country['countryCode']
+            new_country, _ = Country.objects.get_or_create(
+                code=country['countryCode'],
+                defaults={'name': country['countryName']}
             )
             if country['countryCode'] in south_american_country_codes:
-                new_location = Location.objects.create(
+                new_location, _ = Location.objects.get_or_create(
                     city=country['capital'],
                     country=new_country
                 )
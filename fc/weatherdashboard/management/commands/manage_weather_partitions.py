@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from weatherdashboard.partitions import (
+    create_weather_partitions,
+    drop_weather_partitions
+)
+
+
+class Command(BaseCommand):
+    help = 'Creates the next Weather partitions and drops the expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=settings.WEATHER_PARTITIONS_AHEAD,
+            help='Months of partitions created ahead of time'
+        )
+        parser.add_argument(
+            '--retention',
+            type=int,
+            default=settings.WEATHER_RETENTION_MONTHS,
+            help='Months of readings kept, older partitions are dropped'
+        )
+
+    def handle(self, *args, **options):
+        for name in create_weather_partitions(options['ahead']):
+            self.stdout.write('created {}'.format(name))
+        for name in drop_weather_partitions(options['retention']):
+            self.stdout.write('dropped {}'.format(name))
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from weatherdashboard.rollups import rollup_and_prune
+
+
+class Command(BaseCommand):
+    help = 'Rolls up the Weather readings and prunes the old ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon',
+            type=int,
+            default=settings.WEATHER_RAW_HORIZON,
+            help='Days of raw readings kept, older ones are pruned'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.WEATHER_PRUNE_BATCH,
+            help='Readings deleted per transaction'
+        )
+
+    def handle(self, *args, **options):
+        deleted = rollup_and_prune(options['horizon'], options['batch_size'])
+        self.stdout.write('pruned {} readings'.format(deleted))
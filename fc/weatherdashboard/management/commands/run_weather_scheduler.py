@@ -0,0 +1,111 @@
+import heapq
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from weatherdashboard.partitions import create_weather_partitions
+from weatherdashboard.refresh import refresh_locations
+from weatherdashboard.sharding import (
+    claim_shards,
+    release_shards,
+    shard_locations
+)
+
+
+class Command(BaseCommand):
+    help = 'Refreshes the weather of every Location as it comes due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=settings.WEATHER_REFRESH_INTERVAL,
+            help='Seconds between two refreshes of the same location'
+        )
+        parser.add_argument(
+            '--poll',
+            type=int,
+            default=settings.WEATHER_SCHEDULER_POLL,
+            help='Seconds between two checks for new locations and shards'
+        )
+        parser.add_argument(
+            '--shards',
+            type=int,
+            default=settings.WEATHER_REFRESH_SHARDS,
+            help='Number of shards the locations are split into'
+        )
+        parser.add_argument(
+            '--lease',
+            type=int,
+            default=settings.WEATHER_SHARD_LEASE,
+            help='Seconds a shard stays leased without being renewed'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        poll = options['poll']
+        shards_count = options['shards']
+        lease = options['lease']
+        worker = '{}:{}'.format(socket.gethostname(), os.getpid())
+        # (next due unix time, location id)
+        queue = []
+        scheduled = set()
+        try:
+            while True:
+                close_old_connections()
+                # readings of a missing month would go to the default
+                # partition, which retention never drops
+                create_weather_partitions(settings.WEATHER_PARTITIONS_AHEAD)
+                now = time.time()
+                shards = claim_shards(worker, shards_count, lease)
+                self.schedule_new_locations(
+                    queue, scheduled, now, shards, shards_count
+                )
+
+                due_ids = []
+                while queue and queue[0][0] <= now:
+                    _, location_id = heapq.heappop(queue)
+                    due_ids.append(location_id)
+
+                if due_ids:
+                    locations = list(
+                        shard_locations(shards, shards_count).select_related(
+                            'country',
+                            'last_weather'
+                        ).filter(id__in=due_ids)
+                    )
+                    refresh_locations(locations)
+                    refreshed_ids = set(location.id for location in locations)
+                    # deleted locations and locations of released shards
+                    # are not scheduled again
+                    scheduled -= set(due_ids) - refreshed_ids
+                    next_due = time.time() + interval
+                    for location_id in refreshed_ids:
+                        heapq.heappush(queue, (next_due, location_id))
+                    self.stdout.write(
+                        'refreshed {} locations'.format(len(refreshed_ids))
+                    )
+
+                wake_up = now + poll
+                if queue:
+                    wake_up = min(wake_up, queue[0][0])
+                time.sleep(max(wake_up - time.time(), 0))
+        finally:
+            release_shards(worker)
+
+    def schedule_new_locations(self, queue, scheduled, now, shards, shards_count):
+        """
+        New locations of the held shards are due right away
+        """
+        location_ids = shard_locations(shards, shards_count).values_list(
+            'id',
+            flat=True
+        )
+        for location_id in location_ids:
+            if location_id not in scheduled:
+                scheduled.add(location_id)
+                heapq.heappush(queue, (now, location_id))
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.5 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='api_city_id',
+            field=models.BigIntegerField(blank=True, help_text='City id in openweathermap API', null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.5 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0002_location_api_city_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefreshShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField(help_text='Shard number', unique=True)),
+                ('worker', models.CharField(blank=True, help_text='Worker holding the lease', max_length=300)),
+                ('lease_expires_at', models.DateTimeField(blank=True, help_text='Lease expiration, other workers can claim the shard after it', null=True)),
+            ],
+        ),
+    ]
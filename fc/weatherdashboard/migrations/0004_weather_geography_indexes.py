@@ -0,0 +1,39 @@
+# Generated by Django 3.2.5 on 2026-10-18 13:05
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0003_refreshshard'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='weather',
+            name='unix_last_update',
+            field=models.DateTimeField(db_index=True, help_text='Unix by default'),
+        ),
+        # the GiST index of coordinates is rebuilt for geography by postgres
+        migrations.RunSQL(
+            sql=(
+                'ALTER TABLE weatherdashboard_weather '
+                'ALTER COLUMN coordinates TYPE geography(POINT, 4326) '
+                'USING coordinates::geography'
+            ),
+            reverse_sql=(
+                'ALTER TABLE weatherdashboard_weather '
+                'ALTER COLUMN coordinates TYPE geometry(POINT, 4326) '
+                'USING coordinates::geometry'
+            ),
+            state_operations=[
+                migrations.AlterField(
+                    model_name='weather',
+                    name='coordinates',
+                    field=django.contrib.gis.db.models.fields.PointField(geography=True, help_text='API location', srid=4326),
+                ),
+            ],
+        ),
+    ]
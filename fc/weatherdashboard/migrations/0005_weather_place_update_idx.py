@@ -0,0 +1,19 @@
+# Generated by Django 3.2.5 on 2026-10-18 14:20
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.fields.json
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0004_weather_geography_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='weather',
+            index=models.Index(django.db.models.fields.json.KeyTransform('name', 'raw_data'), django.db.models.fields.json.KeyTransform('country', django.db.models.fields.json.KeyTransform('sys', 'raw_data')), django.db.models.expressions.OrderBy(django.db.models.expressions.F('unix_last_update'), descending=True), name='weather_place_update_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.5 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0005_weather_place_update_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='weather_updated_at',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Last time last_weather changed', null=True),
+        ),
+    ]
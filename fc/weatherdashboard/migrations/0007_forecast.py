@@ -0,0 +1,30 @@
+# Generated by Django 3.2.5 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0006_location_weather_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Forecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell_lat', models.FloatField(help_text='Latitude of the grid cell center')),
+                ('cell_lon', models.FloatField(help_text='Longitude of the grid cell center')),
+                ('issued_at', models.DateTimeField(help_text='Time of the API forecast')),
+                ('daily', models.JSONField(help_text='Daily forecast entries')),
+            ],
+            options={
+                'ordering': ['-issued_at'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='forecast',
+            constraint=models.UniqueConstraint(fields=('cell_lat', 'cell_lon', 'issued_at'), name='forecast_cell_issued_unique'),
+        ),
+    ]
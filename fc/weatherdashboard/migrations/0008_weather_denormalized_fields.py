@@ -0,0 +1,70 @@
+# Generated by Django 3.2.5 on 2026-10-18 17:10
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+BATCH_SIZE = 1000
+
+
+def backfill_weather_fields(apps, schema_editor):
+    """
+    Extracts the hot fields of the stored readings from raw_data
+    """
+    Weather = apps.get_model('weatherdashboard', 'Weather')
+    batch = []
+    for weather in Weather.objects.only('id', 'raw_data').iterator(chunk_size=BATCH_SIZE):
+        raw_data = weather.raw_data
+        if 'main' in raw_data and 'temp' in raw_data['main']:
+            weather.temperature = raw_data['main']['temp'] - 273.15
+        weather_conditions = raw_data.get('weather', [])
+        if len(weather_conditions) > 0:
+            weather.condition = "{} ({})".format(
+                weather_conditions[0]['main'],
+                weather_conditions[0]['description']
+            )
+        weather.city = raw_data.get('name', '')
+        weather.country_code = raw_data.get('sys', {}).get('country', '')
+        batch.append(weather)
+        if len(batch) == BATCH_SIZE:
+            Weather.objects.bulk_update(batch, ['temperature', 'condition', 'city', 'country_code'])
+            batch = []
+    Weather.objects.bulk_update(batch, ['temperature', 'condition', 'city', 'country_code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0007_forecast'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='weather',
+            name='weather_place_update_idx',
+        ),
+        migrations.AddField(
+            model_name='weather',
+            name='city',
+            field=models.CharField(blank=True, default='', help_text='City name', max_length=300),
+        ),
+        migrations.AddField(
+            model_name='weather',
+            name='condition',
+            field=models.CharField(blank=True, help_text='Main condition (description)', max_length=300, null=True),
+        ),
+        migrations.AddField(
+            model_name='weather',
+            name='country_code',
+            field=models.CharField(blank=True, default='', help_text='Country code', max_length=2),
+        ),
+        migrations.AddField(
+            model_name='weather',
+            name='temperature',
+            field=models.FloatField(blank=True, help_text='Temperature in celcius', null=True),
+        ),
+        migrations.RunPython(backfill_weather_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='weather',
+            index=models.Index(django.db.models.expressions.F('city'), django.db.models.expressions.F('country_code'), django.db.models.expressions.OrderBy(django.db.models.expressions.F('unix_last_update'), descending=True), name='weather_place_update_idx'),
+        ),
+    ]
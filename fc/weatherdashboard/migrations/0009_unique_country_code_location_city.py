@@ -0,0 +1,62 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:05
+
+from django.db import migrations, models
+from django.db.models.functions import Upper
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Keeps the lowest id of the repeated country codes and location cities,
+    the locations of the removed countries are moved to the kept ones
+    """
+    Country = apps.get_model('weatherdashboard', 'Country')
+    Location = apps.get_model('weatherdashboard', 'Location')
+
+    kept_countries = {}
+    for country_id, code in Country.objects.order_by('id').values_list('id', 'code'):
+        if code in kept_countries:
+            Location.objects.filter(country_id=country_id).update(
+                country_id=kept_countries[code]
+            )
+            Country.objects.filter(id=country_id).delete()
+        else:
+            kept_countries[code] = country_id
+
+    kept_locations = set()
+    duplicate_ids = []
+    locations = Location.objects.annotate(upper_city=Upper('city')).order_by('id')
+    for location_id, city, country_id in locations.values_list('id', 'upper_city', 'country_id'):
+        if (city, country_id) in kept_locations:
+            duplicate_ids.append(location_id)
+        else:
+            kept_locations.add((city, country_id))
+    Location.objects.filter(id__in=duplicate_ids).delete()
+
+    # checks the deferred foreign keys now, the table cannot be altered
+    # with pending trigger events
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0008_weather_denormalized_fields'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='country',
+            name='code',
+            field=models.CharField(help_text='Country code', max_length=2, unique=True),
+        ),
+        # upper() like the iexact lookups of add_location
+        migrations.RunSQL(
+            sql=(
+                'CREATE UNIQUE INDEX location_city_country_uniq '
+                'ON weatherdashboard_location (upper(city), country_id)'
+            ),
+            reverse_sql='DROP INDEX location_city_country_uniq',
+        ),
+    ]
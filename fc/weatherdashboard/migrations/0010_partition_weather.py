@@ -0,0 +1,93 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+PARTITION_WEATHER_SQL = """
+ALTER TABLE weatherdashboard_weather RENAME TO weatherdashboard_weather_old;
+
+CREATE TABLE weatherdashboard_weather (
+    LIKE weatherdashboard_weather_old INCLUDING DEFAULTS
+) PARTITION BY RANGE (unix_last_update);
+
+DO $$
+DECLARE
+    month timestamptz := date_trunc('month', LEAST(
+        (SELECT min(unix_last_update) FROM weatherdashboard_weather_old),
+        now()
+    ));
+BEGIN
+    -- fixed, the later months are created by manage_weather_partitions
+    -- and run_weather_scheduler following WEATHER_PARTITIONS_AHEAD
+    WHILE month <= date_trunc('month', now()) + interval '3 months' LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF weatherdashboard_weather '
+            'FOR VALUES FROM (%L) TO (%L)',
+            'weatherdashboard_weather_p' || to_char(month, 'YYYYMM'),
+            month,
+            month + interval '1 month'
+        );
+        month := month + interval '1 month';
+    END LOOP;
+END $$;
+
+-- readings out of the created months, moved to their month partition when
+-- manage_weather_partitions creates it
+CREATE TABLE weatherdashboard_weather_default
+    PARTITION OF weatherdashboard_weather DEFAULT;
+
+INSERT INTO weatherdashboard_weather SELECT * FROM weatherdashboard_weather_old;
+
+ALTER SEQUENCE weatherdashboard_weather_id_seq OWNED BY weatherdashboard_weather.id;
+
+DROP TABLE weatherdashboard_weather_old;
+
+-- the partition key must be part of the primary key
+ALTER TABLE weatherdashboard_weather ADD PRIMARY KEY (id, unix_last_update);
+
+CREATE INDEX weatherdashboard_weather_unix_last_update_idx
+    ON weatherdashboard_weather (unix_last_update);
+CREATE INDEX weatherdashboard_weather_coordinates_id
+    ON weatherdashboard_weather USING GIST (coordinates);
+CREATE INDEX weather_place_update_idx
+    ON weatherdashboard_weather (city, country_code, unix_last_update DESC);
+"""
+
+UNPARTITION_WEATHER_SQL = """
+ALTER TABLE weatherdashboard_weather RENAME TO weatherdashboard_weather_partitioned;
+
+CREATE TABLE weatherdashboard_weather (
+    LIKE weatherdashboard_weather_partitioned INCLUDING DEFAULTS
+);
+
+INSERT INTO weatherdashboard_weather SELECT * FROM weatherdashboard_weather_partitioned;
+
+ALTER SEQUENCE weatherdashboard_weather_id_seq OWNED BY weatherdashboard_weather.id;
+
+DROP TABLE weatherdashboard_weather_partitioned;
+
+ALTER TABLE weatherdashboard_weather ADD PRIMARY KEY (id);
+
+CREATE INDEX weatherdashboard_weather_unix_last_update_idx
+    ON weatherdashboard_weather (unix_last_update);
+CREATE INDEX weatherdashboard_weather_coordinates_id
+    ON weatherdashboard_weather USING GIST (coordinates);
+CREATE INDEX weather_place_update_idx
+    ON weatherdashboard_weather (city, country_code, unix_last_update DESC);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0009_unique_country_code_location_city'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='location',
+            name='last_weather',
+            field=models.ForeignKey(blank=True, db_constraint=False, help_text='Last weather reading', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='locations', to='weatherdashboard.weather'),
+        ),
+        migrations.RunSQL(PARTITION_WEATHER_SQL, UNPARTITION_WEATHER_SQL),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0010_partition_weather'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], help_text='Size of the bucket', max_length=4)),
+                ('bucket_start', models.DateTimeField(help_text='Start of the bucket')),
+                ('temperature_min', models.FloatField(blank=True, help_text='Min temperature in celcius', null=True)),
+                ('temperature_max', models.FloatField(blank=True, help_text='Max temperature in celcius', null=True)),
+                ('temperature_mean', models.FloatField(blank=True, help_text='Mean temperature in celcius', null=True)),
+                ('condition', models.CharField(blank=True, help_text='Most frequent condition', max_length=300, null=True)),
+                ('samples', models.PositiveIntegerField(help_text='Number of readings')),
+                ('location', models.ForeignKey(help_text='Location of the readings', on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='weatherdashboard.location')),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='weatherrollup',
+            constraint=models.UniqueConstraint(fields=('location', 'bucket', 'bucket_start'), name='weather_rollup_bucket_unique'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.5 on 2026-10-18 18:40
+
+import json
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def move_raw_data(apps, schema_editor):
+    """
+    Copies the raw_data of the stored readings into compressed payloads
+    """
+    Weather = apps.get_model('weatherdashboard', 'Weather')
+    WeatherPayload = apps.get_model('weatherdashboard', 'WeatherPayload')
+    batch = []
+    for weather in Weather.objects.only('id', 'raw_data').iterator(chunk_size=BATCH_SIZE):
+        data = json.dumps(weather.raw_data, separators=(',', ':'))
+        batch.append(WeatherPayload(
+            weather_id=weather.id,
+            data=zlib.compress(data.encode('utf-8'))
+        ))
+        if len(batch) == BATCH_SIZE:
+            WeatherPayload.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    WeatherPayload.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0011_weatherrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherPayload',
+            fields=[
+                ('weather', models.OneToOneField(db_constraint=False, help_text='Weather reading', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='payload', serialize=False, to='weatherdashboard.weather')),
+                ('data', models.BinaryField(help_text='Compressed content from openweathermap API')),
+            ],
+        ),
+        migrations.RunPython(move_raw_data, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='weather',
+            name='raw_data',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.5 on 2026-10-18 19:15
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0012_weatherpayload'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='weather',
+            index=models.Index(django.db.models.expressions.OrderBy(django.db.models.expressions.F('unix_last_update'), descending=True), django.db.models.expressions.OrderBy(django.db.models.expressions.F('id'), descending=True), name='weather_update_id_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.5 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0013_weather_update_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefreshWorker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Worker name', max_length=300, unique=True)),
+                ('heartbeat_expires_at', models.DateTimeField(help_text='Heartbeat expiration, the worker is gone after it')),
+            ],
+        ),
+    ]
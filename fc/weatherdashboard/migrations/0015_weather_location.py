@@ -0,0 +1,44 @@
+# Generated by Django 3.2.5 on 2026-10-18 20:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+
+# readings stored before the column can only be told apart by their place,
+# the last weather of a Location is its own whatever its place
+MARK_LOCATION_READINGS_SQL = """
+UPDATE weatherdashboard_weather w
+SET location_id = l.id
+FROM weatherdashboard_location l
+JOIN weatherdashboard_country c ON c.id = l.country_id
+WHERE w.city = l.city AND w.country_code = c.code;
+
+UPDATE weatherdashboard_weather w
+SET location_id = l.id
+FROM weatherdashboard_location l
+WHERE w.id = l.last_weather_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('weatherdashboard', '0014_refreshworker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='weather',
+            name='location',
+            field=models.ForeignKey(blank=True, db_constraint=False, db_index=False, help_text='Location the reading was requested for', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='weathers', to='weatherdashboard.location'),
+        ),
+        migrations.RunSQL(MARK_LOCATION_READINGS_SQL, migrations.RunSQL.noop),
+        migrations.RemoveIndex(
+            model_name='weather',
+            name='weather_place_update_idx',
+        ),
+        migrations.AddIndex(
+            model_name='weather',
+            index=models.Index(django.db.models.expressions.F('location'), django.db.models.expressions.OrderBy(django.db.models.expressions.F('unix_last_update'), descending=True), name='weather_location_update_idx'),
+        ),
+    ]
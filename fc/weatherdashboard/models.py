@@ -1,7 +1,14 @@
 from django.db import models
-from django.db.models import JSONField
+from django.db.models import F, JSONField
 from django.contrib.gis.db.models import PointField
 
+from types import MappingProxyType
+import json
+import zlib
+
+# process-wide cache of Country.get_names
+_country_names = {}
+
 class Weather(models.Model):
     """
     Stores an openweathermap API reading and stores datetime according to
@@ -13,53 +20,179 @@ class Weather(models.Model):
     dt = datetime.datetime.utcfromtimestamp(1625969973)
     dt = dt.replace(tzinfo=from_zone)
     central = dt.astimezone(to_zone)
+
+    The table is partitioned by month of unix_last_update (migration 0010),
+    partitions are created and dropped by manage_weather_partitions.
+    The API content is stored compressed in WeatherPayload and loaded the
+    first time raw_data is read.
+    Readings of a Location are marked with it, readings of coordinates
+    have no location even if they carry the name of a place
     """
 
-    raw_data = JSONField(
-        help_text=u"Content from openweathermap API"
-    )
     unix_last_update = models.DateTimeField(
-        help_text=u"Unix by default"
+        help_text=u"Unix by default",
+        db_index=True
     )
     coordinates = PointField(
-        help_text=u"API location"
+        help_text=u"API location",
+        geography=True
     )
 
-    @property
-    def temperature(self):
-        kelvin_value = self.raw_data['main']['temp']
-        celcius_value = kelvin_value - 273.15
-        return celcius_value
-
-    @property
-    def condition(self):
-        weather_conditions = self.raw_data['weather']
-        if len(weather_conditions) == 0:
-            return None
-        return "{} ({})".format(
-            weather_conditions[0]['main'],
-            weather_conditions[0]['description']
-        )
+    temperature = models.FloatField(
+        help_text=u"Temperature in celcius",
+        blank=True,
+        null=True
+    )
+    condition = models.CharField(
+        help_text=u"Main condition (description)",
+        max_length=300,
+        blank=True,
+        null=True
+    )
+    city = models.CharField(
+        help_text=u"City name",
+        max_length=300,
+        blank=True,
+        default=''
+    )
+    country_code = models.CharField(
+        help_text=u"Country code",
+        max_length=2,
+        blank=True,
+        default=''
+    )
+    # Weather is partitioned, like its other relations it has no constraint
+    location = models.ForeignKey(
+        'weatherdashboard.Location',
+        on_delete=models.SET_NULL,
+        related_name='weathers',
+        blank=True,
+        null=True,
+        db_index=False,
+        db_constraint=False,
+        help_text=u"Location the reading was requested for"
+    )
 
-    @property
-    def country_code(self):
-        return self.raw_data['sys']['country']
+    # content from openweathermap API, None until loaded or set
+    _raw_data = None
+    _raw_data_changed = False
 
     @property
     def country(self):
-        countries_obj = Country.objects.filter(
-            code=self.raw_data['sys']['country']
-        )
-        if countries_obj.exists():
-            return countries_obj.first().name
-        return None
+        return Country.get_name(self.country_code)
 
     @property
-    def city(self):
-        return self.raw_data['name']
+    def raw_data(self):
+        if self._raw_data is None and self.pk is not None:
+            try:
+                self._raw_data = self.payload.get_data()
+            except WeatherPayload.DoesNotExist:
+                self._raw_data = {}
+        return self._raw_data
+
+    @raw_data.setter
+    def raw_data(self, value):
+        self._raw_data = value
+        self._raw_data_changed = True
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self._raw_data_changed:
+            WeatherPayload.objects.update_or_create(
+                weather_id=self.pk,
+                defaults={'data': WeatherPayload.pack(self._raw_data)}
+            )
+            self._raw_data_changed = False
+
+    @classmethod
+    def save_payloads(cls, weathers):
+        """
+        Stores the raw data of weathers created with bulk_create
+        """
+        payloads = []
+        for weather in weathers:
+            if weather._raw_data_changed:
+                payloads.append(WeatherPayload(
+                    weather_id=weather.pk,
+                    data=WeatherPayload.pack(weather._raw_data)
+                ))
+                weather._raw_data_changed = False
+        WeatherPayload.objects.bulk_create(payloads, ignore_conflicts=True)
 
     class Meta:
         ordering = ['-unix_last_update']
+        indexes = [
+            # latest readings of a Location
+            models.Index(
+                F('location'),
+                F('unix_last_update').desc(),
+                name='weather_location_update_idx'
+            ),
+            # keyset pagination of the readings
+            models.Index(
+                F('unix_last_update').desc(),
+                F('id').desc(),
+                name='weather_update_id_idx'
+            ),
+        ]
+
+
+class WeatherPayload(models.Model):
+    """
+    Stores the zlib compressed openweathermap API content of a Weather, out
+    of the Weather table so its rows stay small
+    """
+
+    # Weather is partitioned so its id can't be referenced by a constraint
+    weather = models.OneToOneField(
+        'weatherdashboard.Weather',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='payload',
+        db_constraint=False,
+        help_text=u"Weather reading"
+    )
+    data = models.BinaryField(
+        help_text=u"Compressed content from openweathermap API"
+    )
+
+    @staticmethod
+    def pack(raw_data):
+        return zlib.compress(
+            json.dumps(raw_data, separators=(',', ':')).encode('utf-8')
+        )
+
+    def get_data(self):
+        return json.loads(zlib.decompress(self.data).decode('utf-8'))
+
+
+class Forecast(models.Model):
+    """
+    Stores an openweathermap API daily forecast of a grid cell, each day is
+    stored as a [unix timestamp, temperature in celcius, condition] list
+    """
+
+    cell_lat = models.FloatField(
+        help_text=u"Latitude of the grid cell center"
+    )
+    cell_lon = models.FloatField(
+        help_text=u"Longitude of the grid cell center"
+    )
+    issued_at = models.DateTimeField(
+        help_text=u"Time of the API forecast"
+    )
+    daily = JSONField(
+        help_text=u"Daily forecast entries"
+    )
+
+    class Meta:
+        ordering = ['-issued_at']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cell_lat', 'cell_lon', 'issued_at'],
+                name='forecast_cell_issued_unique'
+            ),
+        ]
 
 
 class Country(models.Model):
@@ -73,33 +206,168 @@ class Country(models.Model):
     )
     code = models.CharField(
         help_text=u"Country code",
-        max_length=2
+        max_length=2,
+        unique=True
     )
 
     class Meta:
         verbose_name_plural = "Countries"
 
+    @classmethod
+    def get_names(cls):
+        """
+        Returns the read only code to name map of all countries, loaded once
+        per process and cleared when a Country is saved or deleted
+        """
+        names = _country_names.get('names')
+        if names is None:
+            names = MappingProxyType(
+                dict(cls.objects.values_list('code', 'name'))
+            )
+            _country_names['names'] = names
+        return names
+
+    @classmethod
+    def get_name(cls, code):
+        return cls.get_names().get(code)
+
+    @classmethod
+    def clear_names(cls):
+        _country_names.pop('names', None)
+
 class Location(models.Model):
     """
     Stores Locations of countries with its capitals and has a relation to
-    Weather model
+    Weather model, a unique index on (upper(city), country) keeps cities
+    unique per country regardless of case (migration 0009)
     """
 
     city = models.CharField(
         help_text=u"City name",
         max_length=300
     )
+    api_city_id = models.BigIntegerField(
+        blank=True,
+        null=True,
+        help_text=u"City id in openweathermap API"
+    )
     country = models.ForeignKey(
         'weatherdashboard.Country',
         on_delete=models.CASCADE,
         related_name='countries',
         help_text=u"Countries"
     )
+    # Weather is partitioned so its id can't be referenced by a constraint
     last_weather = models.ForeignKey(
         'weatherdashboard.Weather',
         on_delete=models.CASCADE,
         related_name='locations',
         blank=True,
         null=True,
+        db_constraint=False,
         help_text=u"Last weather reading"
     )
+    weather_updated_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text=u"Last time last_weather changed"
+    )
+
+
+class RefreshShard(models.Model):
+    """
+    Lease of a shard of Locations (by id modulo the number of shards) by a
+    weather refresh worker
+    """
+
+    number = models.PositiveIntegerField(
+        help_text=u"Shard number",
+        unique=True
+    )
+    worker = models.CharField(
+        help_text=u"Worker holding the lease",
+        max_length=300,
+        blank=True
+    )
+    lease_expires_at = models.DateTimeField(
+        help_text=u"Lease expiration, other workers can claim the shard after it",
+        blank=True,
+        null=True
+    )
+
+
+class RefreshWorker(models.Model):
+    """
+    Heartbeat of a weather refresh worker, live workers share the shards
+    """
+
+    name = models.CharField(
+        help_text=u"Worker name",
+        max_length=300,
+        unique=True
+    )
+    heartbeat_expires_at = models.DateTimeField(
+        help_text=u"Heartbeat expiration, the worker is gone after it"
+    )
+
+
+class WeatherRollup(models.Model):
+    """
+    Aggregate of the Weather readings of a Location in an hour or a day
+    (UTC), kept after the raw readings are pruned
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    BUCKET_CHOICES = (
+        (HOUR, 'Hour'),
+        (DAY, 'Day'),
+    )
+
+    location = models.ForeignKey(
+        'weatherdashboard.Location',
+        on_delete=models.CASCADE,
+        related_name='rollups',
+        help_text=u"Location of the readings"
+    )
+    bucket = models.CharField(
+        help_text=u"Size of the bucket",
+        max_length=4,
+        choices=BUCKET_CHOICES
+    )
+    bucket_start = models.DateTimeField(
+        help_text=u"Start of the bucket"
+    )
+    temperature_min = models.FloatField(
+        help_text=u"Min temperature in celcius",
+        blank=True,
+        null=True
+    )
+    temperature_max = models.FloatField(
+        help_text=u"Max temperature in celcius",
+        blank=True,
+        null=True
+    )
+    temperature_mean = models.FloatField(
+        help_text=u"Mean temperature in celcius",
+        blank=True,
+        null=True
+    )
+    condition = models.CharField(
+        help_text=u"Most frequent condition",
+        max_length=300,
+        blank=True,
+        null=True
+    )
+    samples = models.PositiveIntegerField(
+        help_text=u"Number of readings"
+    )
+
+    class Meta:
+        ordering = ['bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['location', 'bucket', 'bucket_start'],
+                name='weather_rollup_bucket_unique'
+            ),
+        ]
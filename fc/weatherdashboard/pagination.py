@@ -0,0 +1,124 @@
+"""
+Keyset (cursor) pagination for the list endpoints
+
+Pages are ordered by a unique set of fields and each page is read with a
+WHERE on the last row of the previous one instead of an OFFSET, so every
+page costs the same as the first one
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# Django rest
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginates on ordering, the last field of which must be unique
+    """
+    ordering = ('id',)
+    page_size = settings.API_PAGE_SIZE
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.fields = [
+            queryset.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        page_size = self.get_page_size(request)
+        rows = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_position = [
+                field.value_to_string(rows[-1]) for field in self.fields
+            ]
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def after(self, position):
+        """
+        Returns the filter of the rows after position in ordering, the
+        leading bound on the first field lets Postgres start the index
+        scan (and prune the partitions) at the position
+        """
+        condition = Q()
+        equal = {}
+        for name, value in zip(self.ordering, position):
+            field_name = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{
+                '{}__{}'.format(field_name, lookup): value
+            })
+            equal[field_name] = value
+        first_name = self.ordering[0]
+        first_lookup = 'lte' if first_name.startswith('-') else 'gte'
+        bound = Q(**{
+            '{}__{}'.format(first_name.lstrip('-'), first_lookup): position[0]
+        })
+        return bound & condition
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor is None:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(position) != len(self.fields):
+                raise ValueError
+            return [
+                field.to_python(value)
+                for field, value in zip(self.fields, position)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound('Invalid cursor')
+
+    def encode_cursor(self, position):
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_position)
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data
+        })
+
+
+class WeatherPagination(KeysetPagination):
+    """
+    Latest readings first
+    """
+    ordering = ('-unix_last_update', '-id')
+
+
+class LocationPagination(KeysetPagination):
+    ordering = ('id',)
@@ -0,0 +1,147 @@
+"""
+Monthly partitions of the Weather table
+
+Partitions are named weatherdashboard_weather_pYYYYMM and hold the readings
+whose unix_last_update falls in that month (UTC). Readings of months
+without a partition go to weatherdashboard_weather_default and are moved
+to their partition when it's created. Old readings are removed by dropping
+whole partitions instead of deleting rows
+"""
+import datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+# Models
+from weatherdashboard.models import Location, Weather, WeatherPayload
+
+PARTITION_PREFIX = Weather._meta.db_table + '_p'
+DEFAULT_PARTITION = Weather._meta.db_table + '_default'
+
+# Postgres advisory lock key held while creating partitions
+PARTITIONS_LOCK_ID = 7302
+
+
+def add_months(month, months):
+    """
+    Returns the first day of the month months after month
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1, day=1)
+
+
+def current_month():
+    now = timezone.now().astimezone(datetime.timezone.utc)
+    return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def partition_name(month):
+    return '{}{:04d}{:02d}'.format(PARTITION_PREFIX, month.year, month.month)
+
+
+def partition_month(name):
+    return datetime.datetime(
+        int(name[-6:-2]),
+        int(name[-2:]),
+        1,
+        tzinfo=datetime.timezone.utc
+    )
+
+
+def list_weather_partitions():
+    """
+    Returns the names of the Weather month partitions
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON pg_inherits.inhparent = parent.oid '
+            'JOIN pg_class child ON pg_inherits.inhrelid = child.oid '
+            'WHERE parent.relname = %s',
+            [Weather._meta.db_table]
+        )
+        return sorted(
+            row[0] for row in cursor.fetchall()
+            if row[0].startswith(PARTITION_PREFIX) and
+            len(row[0]) == len(PARTITION_PREFIX) + 6 and
+            row[0][-6:].isdigit()
+        )
+
+
+def create_weather_partitions(ahead):
+    """
+    Creates the partitions of the current month and the next ahead months
+    if they don't exist, moving their readings out of the default
+    partition. Returns the names of the created ones
+    """
+    weather_table = connection.ops.quote_name(Weather._meta.db_table)
+    default_table = connection.ops.quote_name(DEFAULT_PARTITION)
+    month = current_month()
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [PARTITIONS_LOCK_ID])
+        existing = set(list_weather_partitions())
+        for i in range(ahead + 1):
+            start = add_months(month, i)
+            end = add_months(start, 1)
+            name = partition_name(start)
+            if name in existing:
+                continue
+            quoted_name = connection.ops.quote_name(name)
+            cursor.execute(
+                'CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS)'.format(
+                    quoted_name,
+                    weather_table
+                )
+            )
+            cursor.execute(
+                'WITH moved AS (DELETE FROM {} WHERE unix_last_update >= %s '
+                'AND unix_last_update < %s RETURNING *) '
+                'INSERT INTO {} SELECT * FROM moved'.format(
+                    default_table,
+                    quoted_name
+                ),
+                [start, end]
+            )
+            cursor.execute(
+                'ALTER TABLE {} ATTACH PARTITION {} '
+                'FOR VALUES FROM (%s) TO (%s)'.format(
+                    weather_table,
+                    quoted_name
+                ),
+                [start, end]
+            )
+            created.append(name)
+    return created
+
+
+def drop_weather_partitions(retention):
+    """
+    Drops the partitions of the months older than retention months ago
+    with the payloads of their readings, Locations pointing to their
+    readings lose their last weather.
+    Returns the names of the dropped ones
+    """
+    oldest_month = add_months(current_month(), -retention)
+    dropped = []
+    for name in list_weather_partitions():
+        if partition_month(name) >= oldest_month:
+            continue
+        quoted_name = connection.ops.quote_name(name)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE {} SET last_weather_id = NULL '
+                'WHERE last_weather_id IN (SELECT id FROM {})'.format(
+                    connection.ops.quote_name(Location._meta.db_table),
+                    quoted_name
+                )
+            )
+            cursor.execute(
+                'DELETE FROM {} WHERE weather_id IN (SELECT id FROM {})'.format(
+                    connection.ops.quote_name(WeatherPayload._meta.db_table),
+                    quoted_name
+                )
+            )
+            cursor.execute('DROP TABLE {}'.format(quoted_name))
+        dropped.append(name)
+    return dropped
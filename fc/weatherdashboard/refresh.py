@@ -0,0 +1,274 @@
+"""
+Weather refresh engine for Locations
+
+Upstream readings are fetched concurrently in a bounded thread pool and
+the database writes are applied afterwards, in bulk and in the calling
+thread
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+
+import requests
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# Models
+from weatherdashboard.models import Location, Weather
+
+# Serializers
+from weatherdashboard.serializers import CreateWeatherSerializer
+
+# Services
+from weatherdashboard.services import unix_to_utc
+
+# Weather API
+from weatherdashboard.weather_api import (
+    API_KEY,
+    LOCATION_BY_PLACE_API,
+    LOCATION_BY_GROUP_API,
+    get_json
+)
+
+# max number of city ids accepted by the group API
+GROUP_MAX_SIZE = 20
+
+logger = logging.getLogger(__name__)
+
+
+class WeatherAPIError(Exception):
+    """
+    The weather API answered with an error message
+    """
+
+
+def fetch_location_weather(location, timeout):
+    """
+    Gets the API reading of a Location by city and country code.
+    Returns a list with one (location, response_data) tuple
+    """
+    url = LOCATION_BY_PLACE_API.format(
+        location.city,
+        location.country.code,
+        API_KEY
+    )
+    response_data = get_json(url, timeout=timeout, retry=False)
+    if response_data.get('cod') != 200:
+        raise WeatherAPIError(response_data.get('message'))
+    return [(location, response_data)]
+
+
+def fetch_group_weather(locations, timeout):
+    """
+    Gets the API readings of up to GROUP_MAX_SIZE Locations by their API
+    city id with a single request.
+    Returns a list of (location, response_data) tuples
+    """
+    city_ids = set(location.api_city_id for location in locations)
+    url = LOCATION_BY_GROUP_API.format(
+        ','.join(str(city_id) for city_id in city_ids),
+        API_KEY
+    )
+    response_data = get_json(url, timeout=timeout, retry=False)
+    if not 'list' in response_data:
+        raise WeatherAPIError(response_data.get('message'))
+
+    locations_by_city_id = {}
+    for location in locations:
+        locations_by_city_id.setdefault(location.api_city_id, [])
+        locations_by_city_id[location.api_city_id].append(location)
+    results = []
+    for reading in response_data['list']:
+        for location in locations_by_city_id.get(reading['id'], []):
+            results.append((location, reading))
+    return results
+
+
+def fetch_locations_weather(locations, max_workers=None, timeout=None):
+    """
+    Gets the API readings of all locations with at most max_workers
+    requests in flight, each one bounded by timeout seconds:
+        - locations with a known API city id are requested in groups
+        - the rest of locations are requested by city and country code
+    Returns a list of (location, response_data) tuples, locations whose
+    request failed or timed out are left out
+    """
+    if max_workers is None:
+        max_workers = settings.WEATHER_REFRESH_MAX_WORKERS
+    if timeout is None:
+        timeout = settings.WEATHER_REFRESH_TIMEOUT
+
+    # (fetch function, fetch argument, requested locations)
+    fetch_tasks = []
+    identified_locations = []
+    for location in locations:
+        if location.api_city_id is None:
+            fetch_tasks.append((fetch_location_weather, location, [location]))
+        else:
+            identified_locations.append(location)
+    for i in range(0, len(identified_locations), GROUP_MAX_SIZE):
+        group = identified_locations[i:i + GROUP_MAX_SIZE]
+        fetch_tasks.append((fetch_group_weather, group, group))
+    if len(fetch_tasks) == 0:
+        return []
+
+    results = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(fetch_tasks))) as executor:
+        futures = {
+            executor.submit(fetch, fetch_arg, timeout): fetch_locations
+            for fetch, fetch_arg, fetch_locations in fetch_tasks
+        }
+        for future in as_completed(futures):
+            try:
+                results.extend(future.result())
+            except (requests.RequestException, ValueError, WeatherAPIError) as e:
+                logger.warning(
+                    'weather refresh failed for %s: %s',
+                    ', '.join(
+                        '{} ({})'.format(location.city, location.country.code)
+                        for location in futures[future]
+                    ),
+                    e
+                )
+    return results
+
+
+def load_weather_index(location_ids, timestamps):
+    """
+    Returns the stored Weathers of the given locations and timestamps keyed
+    by (location id, unix_last_update), loaded with a single query
+    """
+    weather_index = {}
+    stored_weathers = Weather.objects.filter(
+        location_id__in=location_ids,
+        unix_last_update__in=timestamps
+    )
+    for weather in stored_weathers:
+        key = (weather.location_id, weather.unix_last_update)
+        weather_index.setdefault(key, weather)
+    return weather_index
+
+
+def load_recent_weather_index(locations, freshness):
+    """
+    Returns the latest stored Weather younger than freshness seconds of
+    every location keyed by location id, loaded with a single query on
+    the location index
+    """
+    weather_index = {}
+    if len(locations) == 0:
+        return weather_index
+    since = timezone.now() - datetime.timedelta(seconds=freshness)
+    stored_weathers = Weather.objects.filter(
+        location_id__in=[location.id for location in locations],
+        unix_last_update__gte=since
+    ).order_by('-unix_last_update')
+    for weather in stored_weathers:
+        weather_index.setdefault(weather.location_id, weather)
+    return weather_index
+
+
+def is_fresh(location, freshness):
+    """
+    Checks if the last weather of location is younger than freshness seconds
+    """
+    if location.last_weather is None:
+        return False
+    age = timezone.now() - location.last_weather.unix_last_update
+    return age.total_seconds() < freshness
+
+
+def refresh_locations(locations, freshness=None, max_workers=None, timeout=None):
+    """
+    Updates the last weather of all locations:
+        - locations with a reading younger than freshness seconds are skipped
+        - locations with a stored reading younger than freshness seconds
+          are pointed to it
+        - the rest of locations are requested to the weather API concurrently
+        - the API readings are stored once every request has finished
+    Stored Weathers are looked up in an in-memory index, so the number of
+    queries does not depend on the number of locations.
+    Concurrent refreshes of the same locations are avoided by the callers,
+    run_weather_scheduler workers only refresh the shards they lease
+    """
+    if freshness is None:
+        freshness = settings.WEATHER_FRESHNESS_TTL
+
+    location_weathers = []
+    stale_locations = [
+        location for location in locations
+        if not is_fresh(location, freshness)
+    ]
+    # readings stored by a concurrent refresh of the same locations
+    recent_weather_index = load_recent_weather_index(stale_locations, freshness)
+    pending_locations = []
+    for location in stale_locations:
+        weather = recent_weather_index.get(location.id)
+        if weather is None:
+            pending_locations.append(location)
+        else:
+            location_weathers.append((location, weather))
+
+    fetched = fetch_locations_weather(
+        pending_locations,
+        max_workers=max_workers,
+        timeout=timeout
+    )
+    fetched_keys = [
+        (location.id, unix_to_utc(response_data['dt']))
+        for location, response_data in fetched
+    ]
+    weather_index = load_weather_index(
+        set(key[0] for key in fetched_keys),
+        set(key[1] for key in fetched_keys)
+    )
+    new_weathers = []
+    identified_locations = []
+    for (location, response_data), key in zip(fetched, fetched_keys):
+        if location.api_city_id != response_data['id']:
+            location.api_city_id = response_data['id']
+            identified_locations.append(location)
+        weather = weather_index.get(key)
+        if weather is None:
+            serializer = CreateWeatherSerializer(
+                data={"raw_data": response_data}
+            )
+            serializer.is_valid()
+            weather = serializer.build(serializer.validated_data)
+            weather.location = location
+            weather_index[key] = weather
+            new_weathers.append(weather)
+        location_weathers.append((location, weather))
+
+    store_location_weathers(
+        location_weathers,
+        new_weathers,
+        identified_locations
+    )
+
+
+def store_location_weathers(location_weathers, new_weathers, identified_locations):
+    """
+    Creates new_weathers with their payloads and points every location to
+    its weather with bulk inserts and one bulk update inside a single
+    transaction,
+    identified_locations are the ones with a new API city id
+    """
+    with transaction.atomic():
+        Weather.objects.bulk_create(new_weathers)
+        Weather.save_payloads(new_weathers)
+        changed_locations = {
+            location.id: location for location in identified_locations
+        }
+        now = timezone.now()
+        for location, weather in location_weathers:
+            if location.last_weather_id != weather.id:
+                location.last_weather = weather
+                location.weather_updated_at = now
+                changed_locations[location.id] = location
+        Location.objects.bulk_update(
+            changed_locations.values(),
+            ['last_weather', 'weather_updated_at', 'api_city_id']
+        )
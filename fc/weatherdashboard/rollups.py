@@ -0,0 +1,256 @@
+"""
+Hourly and daily rollups of the Weather readings of the Locations
+
+Complete buckets are aggregated into WeatherRollup rows (min, max and
+mean temperature, most frequent condition and number of readings), after
+which the raw readings older than WEATHER_RAW_HORIZON days can be pruned.
+Readings are stored some minutes after their time, so every rollup also
+aggregates again the buckets of the last rollup_lookback
+"""
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, Max, Min
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+# Models
+from weatherdashboard.models import (
+    Location,
+    Weather,
+    WeatherPayload,
+    WeatherRollup
+)
+
+BUCKET_SIZES = {
+    WeatherRollup.HOUR: datetime.timedelta(hours=1),
+    WeatherRollup.DAY: datetime.timedelta(days=1),
+}
+
+
+def bucket_start(dt, bucket):
+    """
+    Returns the start of the bucket of dt in UTC
+    """
+    dt = dt.astimezone(datetime.timezone.utc).replace(
+        minute=0,
+        second=0,
+        microsecond=0
+    )
+    if bucket == WeatherRollup.DAY:
+        dt = dt.replace(hour=0)
+    return dt
+
+
+def rollup_lookback(bucket):
+    """
+    Returns how far back from the last rolled up bucket readings can
+    still arrive: one bucket plus the age of a fresh reading
+    """
+    return BUCKET_SIZES[bucket] + datetime.timedelta(
+        seconds=settings.WEATHER_FRESHNESS_TTL
+    )
+
+
+def rolled_up_until(bucket):
+    """
+    Returns the end of the last rolled up bucket, or None
+    """
+    last_start = WeatherRollup.objects.filter(bucket=bucket).aggregate(
+        last_start=Max('bucket_start')
+    )['last_start']
+    if last_start is None:
+        return None
+    return last_start + BUCKET_SIZES[bucket]
+
+
+def rollup_weather(bucket):
+    """
+    Aggregates the readings of the buckets completed since the last rollup
+    and of the ones within its lookback.
+    Returns the time until which readings are rolled up
+    """
+    until = bucket_start(timezone.now(), bucket)
+    since = rolled_up_until(bucket)
+    if since is not None:
+        since = bucket_start(since - rollup_lookback(bucket), bucket)
+    else:
+        since = Weather.objects.aggregate(
+            since=Min('unix_last_update')
+        )['since']
+        if since is None:
+            return until
+        since = bucket_start(since, bucket)
+    if since >= until:
+        return until
+
+    # readings of coordinates have no location
+    location_ids = set(Location.objects.values_list('id', flat=True))
+    readings = Weather.objects.filter(
+        location__isnull=False,
+        unix_last_update__gte=since,
+        unix_last_update__lt=until
+    ).annotate(
+        bucket_start=Trunc(
+            'unix_last_update',
+            bucket,
+            tzinfo=datetime.timezone.utc
+        )
+    ).order_by()
+
+    # most frequent condition of each bucket, ties go to the first name
+    conditions = {}
+    condition_counts = readings.filter(condition__isnull=False).values(
+        'location_id',
+        'bucket_start',
+        'condition'
+    ).annotate(samples=Count('id'))
+    for row in condition_counts:
+        key = (row['location_id'], row['bucket_start'])
+        current = conditions.get(key)
+        if (
+            current is None or
+            row['samples'] > current[1] or
+            (row['samples'] == current[1] and row['condition'] < current[0])
+        ):
+            conditions[key] = (row['condition'], row['samples'])
+
+    rollups = []
+    aggregates = readings.values(
+        'location_id',
+        'bucket_start'
+    ).annotate(
+        temperature_min=Min('temperature'),
+        temperature_max=Max('temperature'),
+        temperature_mean=Avg('temperature'),
+        samples=Count('id')
+    )
+    for row in aggregates:
+        if row['location_id'] not in location_ids:
+            # the location was deleted
+            continue
+        key = (row['location_id'], row['bucket_start'])
+        rollups.append(WeatherRollup(
+            location_id=row['location_id'],
+            bucket=bucket,
+            bucket_start=row['bucket_start'],
+            temperature_min=row['temperature_min'],
+            temperature_max=row['temperature_max'],
+            temperature_mean=row['temperature_mean'],
+            condition=conditions.get(key, (None,))[0],
+            samples=row['samples']
+        ))
+
+    with transaction.atomic():
+        WeatherRollup.objects.filter(
+            bucket=bucket,
+            bucket_start__gte=since,
+            bucket_start__lt=until
+        ).delete()
+        WeatherRollup.objects.bulk_create(rollups, batch_size=1000)
+    return until
+
+
+def prune_weather(until, batch_size):
+    """
+    Deletes the readings older than until and their payloads in batches of
+    batch_size, except the last weather of the Locations.
+    Returns the number of readings deleted
+    """
+    weather_table = connection.ops.quote_name(Weather._meta.db_table)
+    location_table = connection.ops.quote_name(Location._meta.db_table)
+    deleted = 0
+    while True:
+        # each batch is its own transaction so locks are held briefly
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {weather} WHERE unix_last_update < %s AND id IN ('
+                'SELECT id FROM {weather} w WHERE w.unix_last_update < %s '
+                'AND NOT EXISTS (SELECT 1 FROM {location} l '
+                'WHERE l.last_weather_id = w.id) LIMIT %s) RETURNING id'.format(
+                    weather=weather_table,
+                    location=location_table
+                ),
+                [until, until, batch_size]
+            )
+            weather_ids = [row[0] for row in cursor.fetchall()]
+            WeatherPayload.objects.filter(weather_id__in=weather_ids).delete()
+            count = len(weather_ids)
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def rollup_and_prune(horizon, batch_size):
+    """
+    Rolls up the complete buckets and prunes the rolled up readings older
+    than horizon days, the ones the next rollup aggregates again are kept.
+    Returns the number of readings deleted
+    """
+    until = min(
+        bucket_start(rollup_weather(bucket) - rollup_lookback(bucket), bucket)
+        for bucket in BUCKET_SIZES
+    )
+    until = min(until, timezone.now() - datetime.timedelta(days=horizon))
+    return prune_weather(until, batch_size)
+
+
+def location_history(location, since, until, bucket):
+    """
+    Returns the temperature of location between since and until by bucket,
+    as lists of unix timestamps and values. Rolled up buckets are read
+    from WeatherRollup and the rest is aggregated from the readings
+    """
+    since = bucket_start(since, bucket)
+    history = list(WeatherRollup.objects.filter(
+        location=location,
+        bucket=bucket,
+        bucket_start__gte=since,
+        bucket_start__lt=until
+    ).order_by('bucket_start').values_list(
+        'bucket_start',
+        'temperature_min',
+        'temperature_max',
+        'temperature_mean',
+        'samples'
+    ))
+
+    readings_since = max(since, rolled_up_until(bucket) or since)
+    if readings_since < until:
+        aggregates = Weather.objects.filter(
+            location=location,
+            unix_last_update__gte=readings_since,
+            unix_last_update__lt=until
+        ).annotate(
+            bucket_start=Trunc(
+                'unix_last_update',
+                bucket,
+                tzinfo=datetime.timezone.utc
+            )
+        ).order_by('bucket_start').values('bucket_start').annotate(
+            temperature_min=Min('temperature'),
+            temperature_max=Max('temperature'),
+            temperature_mean=Avg('temperature'),
+            samples=Count('id')
+        )
+        history += [
+            (
+                row['bucket_start'],
+                row['temperature_min'],
+                row['temperature_max'],
+                row['temperature_mean'],
+                row['samples']
+            )
+            for row in aggregates
+        ]
+
+    columns = list(zip(*history)) or [(), (), (), (), ()]
+    return {
+        'bucket': bucket,
+        'timestamps': [int(dt.timestamp()) for dt in columns[0]],
+        'temperature_min': list(columns[1]),
+        'temperature_max': list(columns[2]),
+        'temperature_mean': list(columns[3]),
+        'samples': list(columns[4])
+    }
@@ -4,6 +4,7 @@ from django.db import transaction
 from django.db.models import JSONField
 from django.contrib.gis.db.models import PointField
 from django.contrib.gis.geos import Point
+from django.utils import timezone
 
 from dateutil import tz
 import datetime
@@ -16,6 +17,56 @@ from rest_framework import status
 from weatherdashboard.models import Location, Country, Weather
 
 
+class SparseFieldsMixin:
+    """
+    Trims the serializer to the comma separated names of the fields query
+    param and leaves out the ones of the exclude query param, field_sources
+    maps the fields that aren't model fields to the model fields they read
+    """
+    field_sources = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is not None:
+            names = self.sparse_field_names(request.query_params)
+            for name in set(self.fields) - names:
+                self.fields.pop(name)
+
+    @classmethod
+    def sparse_field_names(cls, query_params):
+        names = set(cls.Meta.fields)
+        if 'fields' in query_params:
+            names &= set(query_params['fields'].split(','))
+        if 'exclude' in query_params:
+            names -= set(query_params['exclude'].split(','))
+        return names
+
+    @classmethod
+    def sparse_queryset(cls, queryset, names, extra=()):
+        """
+        Returns queryset loading only the model fields read by the fields
+        names and extra, relations are joined and reverse ones prefetched
+        """
+        opts = queryset.model._meta
+        columns = set(extra)
+        related = []
+        prefetched = []
+        for name in names:
+            for source in cls.field_sources.get(name, (name,)):
+                field = opts.get_field(source)
+                if field.auto_created and not field.concrete:
+                    prefetched.append(source)
+                    continue
+                columns.add(source)
+                if field.is_relation:
+                    related.append(source)
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.prefetch_related(*prefetched).only(*columns)
+
+
 class CountrySerializer(serializers.ModelSerializer):
     """
     Swrializer for listing Countries
@@ -28,12 +79,15 @@ class CountrySerializer(serializers.ModelSerializer):
         )
 
 
-class LocationSerializer(serializers.ModelSerializer):
+class LocationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for listing all Locations objects
     """
     country = serializers.SerializerMethodField()
     last_weather_reading = serializers.SerializerMethodField()
+    field_sources = {
+        'last_weather_reading': ('last_weather',)
+    }
 
     class Meta:
         model = Location
@@ -71,6 +125,7 @@ class CreateLocationSerializer(serializers.Serializer):
             return serializers.ValidationError('last weather must exist.')
         data['last_weather'] = Weather.objects.get(id=data['last_weather'])
         data['city'] = data['last_weather'].city
+        data['api_city_id'] = data['last_weather'].raw_data.get('id')
         try:
             data['country'] = Country.objects.get(code=data['country_code'])
         except:
@@ -82,8 +137,10 @@ class CreateLocationSerializer(serializers.Serializer):
     def create(self, validated_data):
         location = Location.objects.create(
             city=validated_data['city'],
+            api_city_id=validated_data.get('api_city_id'),
             country=validated_data['country'],
             last_weather=validated_data['last_weather'],
+            weather_updated_at=timezone.now(),
         )
         return location
 
@@ -110,11 +167,15 @@ class LocationWeatherSerializer(serializers.ModelSerializer):
         }
 
 
-class WeatherSerializer(serializers.ModelSerializer):
+class WeatherSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for listing weathers
     """
     coordinates = serializers.SerializerMethodField()
+    field_sources = {
+        'raw_data': ('payload',),
+        'country': ('country_code',)
+    }
 
     class Meta:
         model = Weather
@@ -159,12 +220,36 @@ class CreateWeatherSerializer(serializers.Serializer):
         dt = dt.replace(tzinfo=from_zone)
         data['unix_last_update'] = dt
         data['coordinates'] = Point(coord['lon'], coord['lat'])
+
+        data['temperature'] = None
+        if 'main' in raw_data and 'temp' in raw_data['main']:
+            data['temperature'] = raw_data['main']['temp'] - 273.15
+        data['condition'] = None
+        weather_conditions = raw_data.get('weather', [])
+        if len(weather_conditions) > 0:
+            data['condition'] = "{} ({})".format(
+                weather_conditions[0]['main'],
+                weather_conditions[0]['description']
+            )
+        data['city'] = raw_data.get('name', '')
+        data['country_code'] = raw_data.get('sys', {}).get('country', '')
         return data
 
-    def create(self, validated_data):
-        new_weather = Weather.objects.create(
+    def build(self, validated_data):
+        """
+        returns the Weather without saving it, for bulk creation
+        """
+        return Weather(
             raw_data=validated_data['raw_data'],
             unix_last_update=validated_data['unix_last_update'],
-            coordinates=validated_data['coordinates']
+            coordinates=validated_data['coordinates'],
+            temperature=validated_data['temperature'],
+            condition=validated_data['condition'],
+            city=validated_data['city'],
+            country_code=validated_data['country_code']
         )
+
+    def create(self, validated_data):
+        new_weather = self.build(validated_data)
+        new_weather.save()
         return new_weather
@@ -0,0 +1,381 @@
+"""
+Weather logic shared by the sync (rest framework) and async views
+
+Functions here only touch the database and the cache, the weather API
+requests are done by the views so the async ones can await them: views
+look up the stored data, request the API url of what is missing and store
+the response
+"""
+from dateutil import tz
+import datetime
+
+from django.conf import settings
+from django.contrib.gis.db.models import PointField
+from django.contrib.gis.geos import GEOSGeometry
+from django.contrib.gis.measure import D
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Func, Value
+from django.utils import timezone
+
+# Django rest
+from rest_framework import serializers
+
+# Models
+from weatherdashboard.models import Country, Forecast, Location, Weather
+
+# Serializers
+from weatherdashboard.serializers import (
+    CreateLocationSerializer,
+    CreateWeatherSerializer,
+    LocationSerializer,
+    WeatherSerializer
+)
+
+# Grid cache
+from weatherdashboard.grid_cache import (
+    FORECAST,
+    get_cell_weather,
+    set_cell_weather
+)
+
+# Locations spatial index
+from weatherdashboard.location_index import find_location_weather
+
+# Weather API
+from weatherdashboard.weather_api import (
+    API_KEY,
+    LOCATION_BY_COORD_API,
+    FORECAST_BY_COORD_API
+)
+
+
+def unix_to_utc(timestamp):
+    """
+    Converts timestamp into utc datetime
+    """
+    from_zone = tz.tzutc()
+    dt = datetime.datetime.utcfromtimestamp(timestamp)
+    dt = dt.replace(tzinfo=from_zone)
+    return dt
+
+
+def validate_location_data(data):
+    """
+    Raises a validation error if the location data is not correct or if
+    the location already exists
+    """
+    if not 'city' in data:
+        raise serializers.ValidationError('missing city attribute in body')
+    if not 'country_code' in data:
+        raise serializers.ValidationError(
+            'missing country code attribute in body'
+        )
+    stored_location = Location.objects.filter(
+        city__iexact=data['city'],
+        country__code=data['country_code']
+    ).select_related('country').first()
+    if stored_location is not None:
+        city = stored_location.city
+        country = stored_location.country.name
+        code = stored_location.country.code
+        raise serializers.ValidationError(
+            '{}, {}({}) already exists'.format(city, country, code)
+        )
+
+
+def create_location(data, response_data):
+    """
+    Creates the Location of data with the API reading as its last weather
+    and returns its serialized data, raises a validation error if the
+    unique index of Location makes the insert fail
+    """
+    if response_data['cod'] != 200:
+        raise serializers.ValidationError(response_data['message'])
+
+    try:
+        with transaction.atomic():
+            weather_data = {"raw_data": response_data}
+            weather_serializer = CreateWeatherSerializer(data=weather_data)
+            weather_serializer.is_valid()
+            weather = weather_serializer.save()
+            location_data = {
+                'city': data['city'],
+                'country_code': data['country_code'],
+                'last_weather': weather.id
+            }
+            location_serializer = CreateLocationSerializer(data=location_data)
+            location_serializer.is_valid()
+            location = location_serializer.save()
+            Weather.objects.filter(pk=weather.pk).update(location=location)
+    except IntegrityError:
+        # the location is stored with the API city name, which can differ
+        # from the one of data
+        raise serializers.ValidationError(
+            '{}, {}({}) already exists'.format(
+                response_data.get('name', data['city']),
+                Country.get_name(data['country_code']),
+                data['country_code']
+            )
+        )
+    return LocationSerializer(location).data
+
+
+def validate_coordinates_data(data):
+    """
+    Raises a validation error if lat or lon are missing
+    """
+    if not 'lat' in data or not 'lon' in data:
+        raise serializers.ValidationError('missing lat, lon params')
+
+
+def get_point(data):
+    return GEOSGeometry('POINT({} {})'.format(
+        data['lon'], data['lat']),
+        srid=4326
+    )
+
+
+class KNNDistance(Func):
+    """
+    PostGIS <-> distance operator, ordering by it walks the GiST index of
+    the geometry (KNN) instead of sorting every row
+    """
+    arg_joiner = ' <-> '
+    template = '%(expressions)s'
+    output_field = FloatField()
+
+    def __init__(self, field_name, point):
+        super().__init__(
+            F(field_name),
+            Value(point, output_field=PointField(geography=True))
+        )
+
+
+def find_nearest_weather(point, min_dt, max_dt):
+    """
+    Returns the nearest Weather to point within WEATHER_NEAREST_DISTANCE km
+    updated between min_dt and max_dt, or None
+    """
+    return Weather.objects.filter(
+        coordinates__dwithin=(point, D(km=settings.WEATHER_NEAREST_DISTANCE)),
+        unix_last_update__gte=min_dt,
+        unix_last_update__lte=max_dt
+    ).annotate(
+        knn_distance=KNNDistance('coordinates', point)
+    ).select_related('payload').order_by('knn_distance').first()
+
+
+def find_current_weather(data):
+    """
+    Returns the serialized nearest Weather to lat, lon not older than
+    WEATHER_CURRENT_TOLERANCE seconds, or None
+    """
+    now = timezone.now()
+    tolerance = datetime.timedelta(seconds=settings.WEATHER_CURRENT_TOLERANCE)
+    weather = find_nearest_weather(get_point(data), now - tolerance, now)
+    if weather is None:
+        return None
+    return WeatherSerializer(weather).data
+
+
+def find_cell_weather(data):
+    """
+    Returns the weather data of the nearest Location with a fresh reading
+    (flagged as derived) or of the nearest stored reading to lat, lon,
+    or None
+    """
+    weather_data = find_location_weather(data)
+    if weather_data is None:
+        weather_data = find_current_weather(data)
+    return weather_data
+
+
+def current_weather_url(cell):
+    return LOCATION_BY_COORD_API.format(cell[0], cell[1], API_KEY)
+
+
+def store_current_weather(data, response_data):
+    """
+    Returns the serialized nearest Weather to lat, lon with the timestamp of
+    the API reading, creating it if it doesn't exist
+    """
+    dt = unix_to_utc(response_data['dt'])
+    weather = find_nearest_weather(get_point(data), dt, dt)
+    if weather is None:
+        serializer = CreateWeatherSerializer(data={"raw_data": response_data})
+        serializer.is_valid()
+        weather = serializer.save()
+    return WeatherSerializer(weather).data
+
+
+def find_place(point):
+    """
+    Returns the (city, country code) of the nearest stored Weather with a
+    place name to point within WEATHER_NEAREST_DISTANCE km, or None
+    """
+    weather = Weather.objects.filter(
+        coordinates__dwithin=(point, D(km=settings.WEATHER_NEAREST_DISTANCE))
+    ).exclude(city='').annotate(
+        knn_distance=KNNDistance('coordinates', point)
+    ).order_by('knn_distance').first()
+    if weather is None:
+        return None
+    return weather.city, weather.country_code
+
+
+def store_overview_weather(data, response_data):
+    """
+    Returns the serialized Weather of the current conditions of a forecast
+    API response, stored in the format of the current weather API, or None
+    if no place name is known around lat, lon.
+    The forecast API has no place names, the reading takes the one of the
+    nearest stored reading. Like every reading of coordinates it has no
+    location, so it's never taken as the reading of a Location
+    """
+    dt = unix_to_utc(response_data['current']['dt'])
+    point = get_point(data)
+    weather = find_nearest_weather(point, dt, dt)
+    if weather is None:
+        place = find_place(point)
+        if place is None:
+            return None
+        current = response_data['current']
+        raw_data = {
+            'coord': {
+                'lat': response_data['lat'],
+                'lon': response_data['lon']
+            },
+            'weather': current['weather'],
+            'main': {
+                'temp': current['temp'],
+                'feels_like': current.get('feels_like'),
+                'pressure': current.get('pressure'),
+                'humidity': current.get('humidity')
+            },
+            'wind': {
+                'speed': current.get('wind_speed'),
+                'deg': current.get('wind_deg')
+            },
+            'clouds': {'all': current.get('clouds')},
+            'dt': current['dt'],
+            'timezone': response_data.get('timezone_offset'),
+            'sys': {
+                'country': place[1],
+                'sunrise': current.get('sunrise'),
+                'sunset': current.get('sunset')
+            },
+            'name': place[0]
+        }
+        serializer = CreateWeatherSerializer(data={"raw_data": raw_data})
+        serializer.is_valid()
+        weather = serializer.save()
+    return WeatherSerializer(weather).data
+
+
+def forecast_data(forecast):
+    """
+    Returns the next 5 days of the Forecast
+    """
+    return [
+        {
+            'unix_last_update': unix_to_utc(dt),
+            'temperature': temperature,
+            'condition': condition
+        }
+        for dt, temperature, condition in forecast.daily[1:6]
+    ]
+
+
+def find_forecast(cell):
+    """
+    Returns the next 5 days of the latest Forecast of cell issued less than
+    WEATHER_FORECAST_TTL seconds ago, or None
+    """
+    since = timezone.now() - datetime.timedelta(
+        seconds=settings.WEATHER_FORECAST_TTL
+    )
+    forecast = Forecast.objects.filter(
+        cell_lat=cell[0],
+        cell_lon=cell[1],
+        issued_at__gte=since
+    ).order_by('-issued_at').first()
+    if forecast is None:
+        return None
+    return forecast_data(forecast)
+
+
+def store_forecast(cell, response_data):
+    """
+    Stores the API daily forecast of cell and returns its next 5 days, the
+    forecast is issued at the time of the current conditions if the API
+    response has them
+    """
+    if not response_data.get('daily'):
+        return None
+    daily = []
+    for forecast in response_data['daily']:
+        temperature = forecast['temp']['day'] - 273.15
+        condition = None
+        if len(forecast['weather']) > 0:
+            condition = "{} ({})".format(
+                forecast['weather'][0]['main'],
+                forecast['weather'][0]['description']
+            )
+        daily.append([forecast['dt'], temperature, condition])
+    issued_at = timezone.now()
+    if 'current' in response_data:
+        issued_at = unix_to_utc(response_data['current']['dt'])
+    forecast, _ = Forecast.objects.get_or_create(
+        cell_lat=cell[0],
+        cell_lon=cell[1],
+        issued_at=issued_at,
+        defaults={'daily': daily}
+    )
+    return forecast_data(forecast)
+
+
+def forecast_url(cell):
+    return FORECAST_BY_COORD_API.format(cell[0], cell[1], API_KEY)
+
+
+def find_overview(data, cell):
+    """
+    Returns the (current weather, forecast) of the cell from the cache or
+    the stored data, the missing ones are None
+    """
+    weather_data = get_cell_weather(cell)
+    if weather_data is None:
+        weather_data = find_cell_weather(data)
+    forecast_data = get_cell_weather(cell, FORECAST)
+    if forecast_data is None:
+        forecast_data = find_forecast(cell)
+    return weather_data, forecast_data
+
+
+def store_overview(data, cell, weather_data, forecast_data, response_data):
+    """
+    Stores and caches the missing current weather and forecast of the cell
+    from a forecast API response and returns them, the current weather is
+    None if the response has no current conditions or no place is known
+    """
+    if weather_data is None and 'current' in response_data:
+        weather_data = store_overview_weather(data, response_data)
+        if weather_data is not None:
+            set_cell_weather(cell, weather_data)
+    if forecast_data is None:
+        forecast_data = store_forecast(cell, response_data)
+        if forecast_data is not None:
+            set_cell_weather(cell, forecast_data, FORECAST)
+    return weather_data, forecast_data
+
+
+def store_cell_weather(data, cell, response_data):
+    """
+    Stores and caches the current weather API reading of the cell and
+    returns it, or None if the API answered with an error
+    """
+    if not 'dt' in response_data:
+        return None
+    weather_data = store_current_weather(data, response_data)
+    set_cell_weather(cell, weather_data)
+    return weather_data
@@ -0,0 +1,91 @@
+"""
+Sharding of the weather refresh across worker processes or nodes
+
+Locations are split into shards by id modulo the number of shards and each
+worker leases a fair share of the shards. Workers announce themselves
+with a heartbeat on every claim, so the share shrinks as soon as a new
+worker starts and the ones holding more than it release the extra shards.
+Leases are claimed with SELECT ... FOR UPDATE SKIP LOCKED so two workers
+never hold the same shard, and shards of a crashed worker are claimed by
+the others once its lease expires
+"""
+import datetime
+import math
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+# Models
+from weatherdashboard.models import Location, RefreshShard, RefreshWorker
+
+
+def shard_locations(shards, shards_count):
+    """
+    Returns the queryset of Locations of the given shards
+    """
+    return Location.objects.annotate(
+        shard=Mod('id', shards_count)
+    ).filter(shard__in=shards)
+
+
+def claim_shards(worker, shards_count, lease):
+    """
+    Renews the heartbeat and leases of worker and claims free or expired
+    shards until it holds its fair share of the live workers, releasing
+    the extra ones.
+    Returns the shard numbers held by worker
+    """
+    now = timezone.now()
+    lease_expires_at = now + datetime.timedelta(seconds=lease)
+    RefreshWorker.objects.update_or_create(
+        name=worker,
+        defaults={'heartbeat_expires_at': lease_expires_at}
+    )
+    RefreshWorker.objects.filter(heartbeat_expires_at__lte=now).delete()
+    RefreshShard.objects.bulk_create(
+        [RefreshShard(number=number) for number in range(shards_count)],
+        ignore_conflicts=True
+    )
+    with transaction.atomic():
+        shards = RefreshShard.objects.filter(number__lt=shards_count)
+        live_workers = RefreshWorker.objects.filter(
+            heartbeat_expires_at__gt=now
+        ).count()
+        fair_share = math.ceil(shards_count / max(live_workers, 1))
+
+        held_shards = list(
+            shards.select_for_update(skip_locked=True).filter(
+                worker=worker,
+                lease_expires_at__gt=now
+            ).order_by('number')
+        )
+        released_shards = held_shards[fair_share:]
+        held_shards = held_shards[:fair_share]
+        if len(held_shards) < fair_share:
+            held_shards += list(
+                shards.select_for_update(skip_locked=True).filter(
+                    Q(lease_expires_at__isnull=True) |
+                    Q(lease_expires_at__lte=now)
+                ).order_by('number')[:fair_share - len(held_shards)]
+            )
+
+        RefreshShard.objects.filter(
+            id__in=[shard.id for shard in held_shards]
+        ).update(worker=worker, lease_expires_at=lease_expires_at)
+        RefreshShard.objects.filter(
+            id__in=[shard.id for shard in released_shards]
+        ).update(worker='', lease_expires_at=None)
+    return set(shard.number for shard in held_shards)
+
+
+def release_shards(worker):
+    """
+    Releases every shard held by worker and removes its heartbeat
+    """
+    RefreshShard.objects.filter(worker=worker).update(
+        worker='',
+        lease_expires_at=None
+    )
+    RefreshWorker.objects.filter(name=worker).delete()
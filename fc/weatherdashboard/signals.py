@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from weatherdashboard.models import Country
+
+
+@receiver(post_save, sender=Country)
+@receiver(post_delete, sender=Country)
+def clear_country_names(sender, **kwargs):
+    """
+    Countries changed, the code to name map is loaded again on next use
+    """
+    Country.clear_names()
@@ -1,3 +1,633 @@
-from django.test import TestCase
+import datetime
+import re
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.gis.geos import Point
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+# Django rest
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+# Models
+from weatherdashboard.models import (
+    Country,
+    Location,
+    Weather,
+    WeatherPayload,
+    WeatherRollup
+)
+
+# Serializers
+from weatherdashboard.serializers import LocationSerializer, WeatherSerializer
+
+# Refresh engine
+from weatherdashboard.refresh import refresh_locations
+
+# Sharding
+from weatherdashboard.sharding import claim_shards, release_shards
+
+# Grid cache
+from weatherdashboard.grid_cache import get_cell
+
+# Locations spatial index
+from weatherdashboard.location_index import LocationIndex
+
+# Partitions
+from weatherdashboard.partitions import (
+    add_months,
+    partition_month,
+    partition_name
+)
+
+# Rollups
+from weatherdashboard.rollups import (
+    bucket_start,
+    location_history,
+    prune_weather,
+    rollup_weather
+)
+
+# Pagination
+from weatherdashboard.pagination import LocationPagination, WeatherPagination
+
+# Weather API
+from weatherdashboard.weather_api import (
+    LOCATION_BY_GROUP_API,
+    LOCATION_BY_PLACE_API
+)
+
+
+UTC = datetime.timezone.utc
+
+
+def api_pattern(url):
+    """
+    Returns the regex matching the urls of a weather API url template
+    """
+    return re.compile(re.escape(url).replace(re.escape('{}'), '(.*?)') + '$')
+
+
+def api_reading(city_id, city, country_code, dt):
+    """
+    Returns a current weather API reading
+    """
+    return {
+        'cod': 200,
+        'id': city_id,
+        'name': city,
+        'dt': int(dt.timestamp()),
+        'coord': {'lat': -34.61, 'lon': -58.38},
+        'main': {'temp': 293.15},
+        'weather': [{'main': 'Clear', 'description': 'clear sky'}],
+        'sys': {'country': country_code}
+    }
+
+
+class FakeWeatherAPI:
+    """
+    Answers the place and group requests of the refresh engine with
+    readings taken at dt
+    """
+
+    def __init__(self, dt):
+        self.dt = dt
+        self.place_pattern = api_pattern(LOCATION_BY_PLACE_API)
+        self.group_pattern = api_pattern(LOCATION_BY_GROUP_API)
+        self.place_ids = {}
+
+    def __call__(self, url, timeout=None, retry=True):
+        match = self.group_pattern.match(url)
+        if match is not None:
+            return {'list': [
+                api_reading(int(city_id), 'City {}'.format(city_id), 'AR', self.dt)
+                for city_id in match.group(1).split(',')
+            ]}
+        city, country_code = self.place_pattern.match(url).group(1, 2)
+        city_id = self.place_ids.setdefault(city, 1000 + len(self.place_ids))
+        return api_reading(city_id, city, country_code, self.dt)
+
+    def group_city_ids(self, url):
+        return self.group_pattern.match(url).group(1).split(',')
+
+
+class RefreshTestCase(TestCase):
+    """
+    Refreshes Locations against a fake weather API
+    """
+
+    def setUp(self):
+        self.country = Country.objects.create(name='Argentina', code='AR')
+        self.now = timezone.now().replace(microsecond=0)
+        self.api = FakeWeatherAPI(self.now)
+        patcher = mock.patch(
+            'weatherdashboard.refresh.get_json',
+            side_effect=self.api
+        )
+        self.get_json = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_locations(self, count, identified=True, start=1):
+        return [
+            Location.objects.create(
+                city='City {}'.format(number),
+                country=self.country,
+                api_city_id=number if identified else None
+            )
+            for number in range(start, start + count)
+        ]
+
+    def refresh(self, locations, **kwargs):
+        # the fetches run in threads, nothing is loaded lazily there
+        refresh_locations(
+            Location.objects.select_related(
+                'country',
+                'last_weather'
+            ).filter(
+                id__in=[location.id for location in locations]
+            ).order_by('id'),
+            **kwargs
+        )
+
+
+def create_weather(dt, location=None, temperature=20.0,
+                   condition='Clear (clear sky)', city='Buenos Aires',
+                   country_code='AR', raw_data=None):
+    weather = Weather(
+        unix_last_update=dt,
+        coordinates=Point(-58.38, -34.61),
+        temperature=temperature,
+        condition=condition,
+        city=city,
+        country_code=country_code,
+        location=location
+    )
+    if raw_data is not None:
+        weather.raw_data = raw_data
+    weather.save()
+    return weather
+
+
+class LocationReadingsTestCase(TestCase):
+    """
+    Readings of a Location, starting in the hour three hours ago
+    """
+
+    def setUp(self):
+        country = Country.objects.create(name='Argentina', code='AR')
+        self.location = Location.objects.create(
+            city='Buenos Aires',
+            country=country
+        )
+        self.hour = bucket_start(
+            timezone.now() - datetime.timedelta(hours=3),
+            WeatherRollup.HOUR
+        )
+
+    def create_reading(self, minutes, **kwargs):
+        return create_weather(
+            self.hour + datetime.timedelta(minutes=minutes),
+            location=self.location,
+            **kwargs
+        )
+
+
+class RefreshQueriesTest(RefreshTestCase):
+
+    def count_queries(self, locations):
+        with CaptureQueriesContext(connection) as queries:
+            self.refresh(locations)
+        return len(queries)
+
+    def test_queries_do_not_depend_on_the_number_of_locations(self):
+        few = self.count_queries(self.create_locations(2))
+        many = self.count_queries(self.create_locations(45, start=100))
+        self.assertEqual(few, many)
+        self.assertEqual(Weather.objects.count(), 47)
+        self.assertFalse(
+            Location.objects.filter(last_weather__isnull=True).exists()
+        )
+
+
+class RefreshDedupTest(RefreshTestCase):
+
+    def test_unchanged_readings_are_not_stored_again(self):
+        locations = self.create_locations(3)
+        self.refresh(locations)
+        self.refresh(locations, freshness=0)
+        self.assertEqual(self.get_json.call_count, 2)
+        self.assertEqual(Weather.objects.count(), 3)
+
+    def test_recent_readings_of_the_location_are_reused(self):
+        location, = self.create_locations(1)
+        weather = create_weather(self.now, location=location)
+        self.refresh([location])
+        self.get_json.assert_not_called()
+        location.refresh_from_db()
+        self.assertEqual(location.last_weather_id, weather.id)
+
+    def test_readings_of_coordinates_are_not_reused(self):
+        location, = self.create_locations(1)
+        create_weather(self.now, city=location.city, country_code='AR')
+        self.refresh([location])
+        self.assertEqual(self.get_json.call_count, 1)
+        location.refresh_from_db()
+        self.assertEqual(location.last_weather.location_id, location.id)
+
+
+class RefreshGroupingTest(RefreshTestCase):
+
+    def test_identified_locations_are_requested_in_groups(self):
+        self.refresh(self.create_locations(45))
+        group_sizes = sorted(
+            len(self.api.group_city_ids(call.args[0]))
+            for call in self.get_json.call_args_list
+        )
+        self.assertEqual(group_sizes, [5, 20, 20])
+        self.assertEqual(Weather.objects.count(), 45)
+
+    def test_other_locations_are_requested_by_place(self):
+        locations = self.create_locations(3, identified=False)
+        self.refresh(locations)
+        self.assertEqual(self.get_json.call_count, 3)
+        # the API city ids are kept for the next group requests
+        self.assertEqual(
+            Location.objects.filter(api_city_id__isnull=False).count(),
+            3
+        )
+
+    def test_repeated_city_ids_are_requested_once(self):
+        locations = self.create_locations(2)
+        Location.objects.filter(id=locations[1].id).update(
+            api_city_id=locations[0].api_city_id
+        )
+        self.refresh(locations)
+        call, = self.get_json.call_args_list
+        self.assertEqual(
+            self.api.group_city_ids(call.args[0]),
+            [str(locations[0].api_city_id)]
+        )
+        self.assertEqual(
+            Location.objects.filter(last_weather__isnull=False).count(),
+            2
+        )
+
+
+class ClaimShardsTest(TestCase):
+
+    def test_new_worker_gets_a_fair_share(self):
+        shards_a = claim_shards('a', 16, 120)
+        self.assertEqual(len(shards_a), 16)
+
+        # every shard is leased by a, b only announces itself
+        self.assertEqual(claim_shards('b', 16, 120), set())
+
+        shards_a = claim_shards('a', 16, 120)
+        self.assertEqual(len(shards_a), 8)
+        shards_b = claim_shards('b', 16, 120)
+        self.assertEqual(len(shards_b), 8)
+        self.assertFalse(shards_a & shards_b)
+
+    def test_released_shards_are_claimed_again(self):
+        claim_shards('a', 16, 120)
+        claim_shards('b', 16, 120)
+        claim_shards('a', 16, 120)
+        claim_shards('b', 16, 120)
+        release_shards('b')
+        self.assertEqual(len(claim_shards('a', 16, 120)), 16)
+
+
+@override_settings(WEATHER_GRID_SIZE=0.05)
+class GetCellTest(SimpleTestCase):
+
+    def test_cell_center(self):
+        self.assertEqual(get_cell(-34.6037, -58.3816), (-34.625, -58.375))
+
+    def test_same_cell(self):
+        self.assertEqual(
+            get_cell(-34.6037, -58.3816),
+            get_cell('-34.61', '-58.38')
+        )
+
+    def test_neighbour_cell(self):
+        self.assertNotEqual(get_cell(0.01, 0.01), get_cell(-0.01, 0.01))
+
+
+class LocationIndexTest(SimpleTestCase):
+
+    def setUp(self):
+        self.index = LocationIndex(10.0)
+        # no sync with the database during the test
+        self.index.checked_at = time.monotonic()
+        self.now = timezone.now()
+
+    def test_nearest(self):
+        self.index.put(1, -34.60, -58.38, self.now, {'city': 'near'})
+        self.index.put(2, -34.66, -58.45, self.now, {'city': 'far'})
+        weather_data = self.index.nearest(-34.601, -58.381, 600)
+        self.assertEqual(weather_data['city'], 'near')
+        self.assertTrue(weather_data['derived'])
+        self.assertLess(weather_data['derived_distance'], 1)
+
+    def test_stale_readings_are_skipped(self):
+        old = self.now - datetime.timedelta(hours=2)
+        self.index.put(1, -34.60, -58.38, old, {'city': 'old'})
+        self.index.put(2, -34.62, -58.40, self.now, {'city': 'fresh'})
+        weather_data = self.index.nearest(-34.60, -58.38, 600)
+        self.assertEqual(weather_data['city'], 'fresh')
+
+    def test_out_of_radius(self):
+        self.index.put(1, -34.60, -58.38, self.now, {'city': 'near'})
+        self.assertIsNone(self.index.nearest(0, 0, 600))
+
+    def test_antimeridian(self):
+        self.index.put(1, 0, 179.99, self.now, {'city': 'east'})
+        weather_data = self.index.nearest(0, -179.99, 600)
+        self.assertEqual(weather_data['city'], 'east')
+
+    def test_moved_location(self):
+        self.index.put(1, -34.60, -58.38, self.now, {'city': 'before'})
+        self.index.put(1, 40.41, -3.70, self.now, {'city': 'after'})
+        self.assertIsNone(self.index.nearest(-34.60, -58.38, 600))
+        self.assertEqual(
+            self.index.nearest(40.41, -3.70, 600)['city'],
+            'after'
+        )
+
+    def test_result_is_a_copy(self):
+        self.index.put(1, -34.60, -58.38, self.now, {'city': 'near'})
+        self.index.nearest(-34.60, -58.38, 600)['city'] = 'changed'
+        self.assertEqual(
+            self.index.nearest(-34.60, -58.38, 600)['city'],
+            'near'
+        )
+
+
+class LocationIndexSyncTest(TestCase):
+
+    def setUp(self):
+        country = Country.objects.create(name='Argentina', code='AR')
+        self.location = Location.objects.create(
+            city='Buenos Aires',
+            country=country
+        )
+        weather = create_weather(timezone.now(), location=self.location)
+        Location.objects.filter(id=self.location.id).update(
+            last_weather=weather,
+            weather_updated_at=timezone.now()
+        )
+        self.index = LocationIndex(10.0)
+        self.index.sync()
+
+    def test_sync_loads_the_locations(self):
+        self.assertIn(self.location.id, self.index.entries)
+
+    def test_deleted_locations_are_removed(self):
+        self.location.delete()
+        self.index.sync()
+        self.assertNotIn(self.location.id, self.index.entries)
+        self.assertEqual(self.index.cells, {})
+
+    def test_locations_without_weather_are_removed(self):
+        Location.objects.filter(id=self.location.id).update(last_weather=None)
+        self.index.sync()
+        self.assertNotIn(self.location.id, self.index.entries)
+
+
+class PartitionsTest(SimpleTestCase):
+
+    def test_add_months(self):
+        month = datetime.datetime(2026, 11, 1, tzinfo=UTC)
+        self.assertEqual(
+            add_months(month, 2),
+            datetime.datetime(2027, 1, 1, tzinfo=UTC)
+        )
+        self.assertEqual(
+            add_months(month, -11),
+            datetime.datetime(2025, 12, 1, tzinfo=UTC)
+        )
+        self.assertEqual(add_months(month, 0), month)
+
+    def test_partition_name(self):
+        month = datetime.datetime(2026, 1, 1, tzinfo=UTC)
+        self.assertEqual(partition_name(month), 'weatherdashboard_weather_p202601')
+
+    def test_partition_month(self):
+        month = datetime.datetime(2026, 12, 1, tzinfo=UTC)
+        self.assertEqual(partition_month(partition_name(month)), month)
+
+
+class RollupTest(LocationReadingsTestCase):
+
+    def get_rollup(self):
+        return WeatherRollup.objects.get(
+            location=self.location,
+            bucket=WeatherRollup.HOUR,
+            bucket_start=self.hour
+        )
+
+    def test_readings_of_the_location_are_rolled_up(self):
+        self.create_reading(10, temperature=10.0, condition='Rain (light rain)')
+        self.create_reading(20, temperature=14.0)
+        self.create_reading(30, temperature=18.0)
+        # a reading of coordinates named like the location
+        create_weather(
+            self.hour + datetime.timedelta(minutes=40),
+            temperature=40.0,
+            city=self.location.city,
+            country_code='AR'
+        )
+        rollup_weather(WeatherRollup.HOUR)
+
+        rollup = self.get_rollup()
+        self.assertEqual(rollup.samples, 3)
+        self.assertEqual(rollup.temperature_min, 10.0)
+        self.assertEqual(rollup.temperature_max, 18.0)
+        self.assertAlmostEqual(rollup.temperature_mean, 14.0)
+        self.assertEqual(rollup.condition, 'Clear (clear sky)')
+
+    def test_late_readings_are_rolled_up_again(self):
+        self.create_reading(10)
+        rollup_weather(WeatherRollup.HOUR)
+        self.create_reading(50)
+        rollup_weather(WeatherRollup.HOUR)
+        self.assertEqual(self.get_rollup().samples, 2)
+
+    def test_prune_keeps_the_last_weather(self):
+        old = self.create_reading(10, raw_data={'dt': 1})
+        last = self.create_reading(20, raw_data={'dt': 2})
+        Location.objects.filter(id=self.location.id).update(last_weather=last)
+
+        # one reading per batch, the loop stops on the empty one
+        deleted = prune_weather(
+            self.hour + datetime.timedelta(hours=1),
+            batch_size=1
+        )
+        self.assertEqual(deleted, 1)
+        self.assertEqual(
+            list(Weather.objects.values_list('id', flat=True)),
+            [last.id]
+        )
+        self.assertFalse(WeatherPayload.objects.filter(weather_id=old.id).exists())
+        self.assertTrue(WeatherPayload.objects.filter(weather_id=last.id).exists())
+
+
+class LocationHistoryTest(LocationReadingsTestCase):
+
+    def get_history(self):
+        return location_history(
+            self.location,
+            self.hour,
+            timezone.now() + datetime.timedelta(seconds=1),
+            WeatherRollup.HOUR
+        )
+
+    def test_readings_are_aggregated_by_bucket(self):
+        self.create_reading(10, temperature=10.0)
+        self.create_reading(20, temperature=20.0)
+        self.create_reading(70, temperature=30.0)
+        history = self.get_history()
+        self.assertEqual(history['timestamps'], [
+            int(self.hour.timestamp()),
+            int(self.hour.timestamp()) + 3600
+        ])
+        self.assertEqual(history['temperature_mean'], [15.0, 30.0])
+        self.assertEqual(history['samples'], [2, 1])
+
+    def test_rolled_up_buckets_are_read_from_the_rollups(self):
+        self.create_reading(10, temperature=10.0)
+        rollup_weather(WeatherRollup.HOUR)
+        # the rolled up readings are pruned
+        Weather.objects.all().delete()
+        create_weather(timezone.now(), location=self.location, temperature=20.0)
+        history = self.get_history()
+        self.assertEqual(history['temperature_mean'], [10.0, 20.0])
+        self.assertEqual(history['timestamps'][0], int(self.hour.timestamp()))
+
+    def test_readings_of_coordinates_are_left_out(self):
+        create_weather(
+            self.hour + datetime.timedelta(minutes=10),
+            city=self.location.city,
+            country_code='AR'
+        )
+        self.assertEqual(self.get_history()['timestamps'], [])
+
+
+class KeysetPaginationTest(TestCase):
+
+    def setUp(self):
+        self.pagination = WeatherPagination()
+        self.pagination.fields = [
+            Weather._meta.get_field('unix_last_update'),
+            Weather._meta.get_field('id')
+        ]
+        now = timezone.now().replace(microsecond=0)
+        # pairs of readings with the same time, told apart by id
+        self.weathers = [
+            create_weather(now - datetime.timedelta(minutes=i // 2))
+            for i in range(7)
+        ]
+
+    def get_request(self, params):
+        return Request(APIRequestFactory().get('/', params))
+
+    def test_pages_follow_the_ordering(self):
+        ids = []
+        params = {'page_size': 2}
+        while True:
+            rows = self.pagination.paginate_queryset(
+                Weather.objects.all(),
+                self.get_request(params)
+            )
+            ids += [row.id for row in rows]
+            if self.pagination.next_position is None:
+                break
+            params['cursor'] = self.pagination.encode_cursor(
+                self.pagination.next_position
+            )
+        self.assertEqual(ids, list(
+            Weather.objects.order_by(
+                '-unix_last_update',
+                '-id'
+            ).values_list('id', flat=True)
+        ))
+
+    def test_after(self):
+        for position in self.weathers:
+            key = (position.unix_last_update, position.id)
+            rows = Weather.objects.filter(self.pagination.after(list(key)))
+            self.assertEqual(
+                set(row.id for row in rows),
+                set(
+                    weather.id for weather in self.weathers
+                    if (weather.unix_last_update, weather.id) < key
+                )
+            )
+
+    def test_after_ascending(self):
+        pagination = LocationPagination()
+        position = self.weathers[3].id
+        rows = Weather.objects.filter(pagination.after([position]))
+        self.assertEqual(
+            set(row.id for row in rows),
+            set(weather.id for weather in self.weathers if weather.id > position)
+        )
+
+    def test_cursor_round_trip(self):
+        weather = self.weathers[0]
+        position = [
+            field.value_to_string(weather) for field in self.pagination.fields
+        ]
+        cursor = self.pagination.encode_cursor(position)
+        request = self.get_request({'cursor': cursor})
+        self.assertEqual(
+            self.pagination.decode_cursor(request),
+            [weather.unix_last_update, weather.id]
+        )
+
+    def test_no_cursor(self):
+        self.assertIsNone(self.pagination.decode_cursor(self.get_request({})))
+
+    def test_invalid_cursor(self):
+        for cursor in ['not a cursor', self.pagination.encode_cursor([1])]:
+            with self.assertRaises(NotFound):
+                self.pagination.decode_cursor(
+                    self.get_request({'cursor': cursor})
+                )
+
+
+class SparseFieldNamesTest(SimpleTestCase):
+
+    def test_all_fields_by_default(self):
+        self.assertEqual(
+            WeatherSerializer.sparse_field_names({}),
+            set(WeatherSerializer.Meta.fields)
+        )
+
+    def test_fields(self):
+        self.assertEqual(
+            WeatherSerializer.sparse_field_names({
+                'fields': 'temperature,condition,unknown'
+            }),
+            {'temperature', 'condition'}
+        )
+
+    def test_exclude(self):
+        self.assertEqual(
+            WeatherSerializer.sparse_field_names({'exclude': 'raw_data'}),
+            set(WeatherSerializer.Meta.fields) - {'raw_data'}
+        )
+
+    def test_fields_and_exclude(self):
+        self.assertEqual(
+            LocationSerializer.sparse_field_names({
+                'fields': 'city,country',
+                'exclude': 'country'
+            }),
+            {'city'}
+        )
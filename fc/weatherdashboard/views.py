@@ -1,9 +1,7 @@
 from django.shortcuts import render
-from dateutil import tz
-import requests
-import datetime
+from django.utils import timezone
 
-from django.contrib.gis.geos import GEOSGeometry
+import datetime
 
 # Django rest
 from rest_framework import viewsets, mixins
@@ -29,14 +27,43 @@ from weatherdashboard.serializers import (
     CountrySerializer
 )
 
-# ENV data
-import environ
-env = environ.Env()
-environ.Env.read_env()
-API_KEY = env('WEATHER_API_KEY')
-LOCATION_BY_PLACE_API = env('LOCATION_BY_PLACE_API')
-LOCATION_BY_COORD_API = env('LOCATION_BY_COORD_API')
-FORECAST_BY_COORD_API = env('FORECAST_BY_COORD_API')
+# Services
+from weatherdashboard.services import (
+    unix_to_utc,
+    validate_location_data,
+    create_location,
+    validate_coordinates_data,
+    find_cell_weather,
+    current_weather_url,
+    store_current_weather,
+    find_forecast,
+    forecast_url,
+    store_forecast,
+    find_overview,
+    store_overview,
+    store_cell_weather
+)
+
+# Pagination
+from weatherdashboard.pagination import LocationPagination, WeatherPagination
+
+# Rollups
+from weatherdashboard.rollups import BUCKET_SIZES, location_history
+
+# Grid cache
+from weatherdashboard.grid_cache import (
+    FORECAST,
+    OVERVIEW,
+    get_cell,
+    cached_cell_weather
+)
+
+# Weather API
+from weatherdashboard.weather_api import (
+    API_KEY,
+    LOCATION_BY_PLACE_API,
+    get_json
+)
 
 class CountryViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     """
@@ -54,9 +81,16 @@ class LocationViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.G
     """
     Viewset for listing locations
     """
+    pagination_class = LocationPagination
 
     def get_queryset(self):
-        return Location.objects.all();
+        queryset = Location.objects.select_related('country', 'last_weather')
+        if self.action in ['list', 'update_weather']:
+            names = LocationSerializer.sparse_field_names(
+                self.request.query_params
+            )
+            queryset = LocationSerializer.sparse_queryset(queryset, names)
+        return queryset
 
     def get_serializer_class(self):
         if self.action in ['create', 'add_location']:
@@ -80,15 +114,6 @@ class LocationViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.G
         location_serializer = LocationSerializer(location)
         return Response(location_serializer, status=status.HTTP_201_CREATED)
 
-    def unix_to_utc(self, timestamp):
-        """
-        Converts timestamp into utc datetime
-        """
-        from_zone = tz.tzutc()
-        dt = datetime.datetime.utcfromtimestamp(timestamp)
-        dt = dt.replace(tzinfo=from_zone)
-        return dt
-
     @action(detail=False, methods=['post'])
     def add_location(self, request, *args, **kwargs):
         """
@@ -99,119 +124,79 @@ class LocationViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.G
             - if API returns another status_code return the object
         """
         data = request.data
-        if not 'city' in data:
-            raise serializers.ValidationError('missing city attribute in body')
-        if not 'country_code' in data:
-            raise serializers.ValidationError(
-                'missing country code attribute in body'
-            )
-        stored_location = Location.objects.filter(
-            city__iexact=data['city'],
-            country__code=data['country_code']
-        )
-        if stored_location.exists():
-            stored_location = stored_location.first()
-            city = stored_location.city
-            country = stored_location.country.name
-            code = stored_location.country.code
-            raise serializers.ValidationError(
-                '{}, {}({}) already exists'.format(city, country, code)
-            )
+        validate_location_data(data)
 
         url = LOCATION_BY_PLACE_API.format(
             data['city'],
             data['country_code'],
             API_KEY
         )
-        response = requests.get(url)
-        response_data = response.json()
-
-        if response_data['cod'] != 200:
-            raise serializers.ValidationError(response_data['message'])
-
-        dt = self.unix_to_utc(response_data['dt'])
-
-        weather_data = {"raw_data": response_data}
-        weather_serializer = CreateWeatherSerializer(data=weather_data)
-        weather_serializer.is_valid()
-        weather = weather_serializer.save()
-        data['last_weather'] = weather.id
-        location_serializer = self.get_serializer(data=data)
-        location_serializer.is_valid()
-        location = location_serializer.save()
-        new_location_serializer = LocationSerializer(location)
-        return Response(
-            new_location_serializer.data,
-            status=status.HTTP_201_CREATED
-        )
+        response_data = get_json(url)
+        location_data = create_location(data, response_data)
+        return Response(location_data, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['get'])
     def update_weather(self, request, *args, **kwargs):
         """
-        iterates by all Locations and updates its weathre attribute
-        for each location:
-            - gets weather by city and country code
-            - if weather doesn't exists creates a new with the weather API data
-            - points weather to location
+        returns all Locations with their last weather reading, the readings
+        are kept up to date by the run_weather_scheduler command so no
+        weather API request is done here
         """
-        for location in Location.objects.iterator():
-            data = request.query_params
-            if not 'dt' in data:
-                raise serializers.ValidationError('missing dt param')
-
-            dt = self.unix_to_utc(int(data['dt']))
-
-            weather_return = None
-            stored_weathers = Weather.objects.filter(
-                unix_last_update=dt,
-                raw_data__sys__country=location.country.code,
-                raw_data__name=location.city
-            )
-            if stored_weathers.exists():
-                weather_return = stored_weathers.first()
-
-            if weather_return is None:
-                url = LOCATION_BY_PLACE_API.format(
-                    location.city,
-                    location.country.code,
-                    API_KEY
-                )
-                response = requests.get(url)
-                response_data = response.json()
-
-                dt = self.unix_to_utc(response_data['dt'])
-                second_weather_filter = Weather.objects.filter(
-                    unix_last_update=dt,
-                    raw_data__sys__country=response_data['sys']['country'],
-                    raw_data__name=response_data['name']
-                )
-                if second_weather_filter.exists():
-                    weather_return = second_weather_filter.first()
-
-            if weather_return is None:
-                data = {"raw_data": response_data}
-                serializer = CreateWeatherSerializer(data=data)
-                serializer.is_valid()
-                weather_return = serializer.save()
-
-            no_weather = location.last_weather is None
-            if no_weather or (location.last_weather.id != weather_return.id):
-                location.last_weather = weather_return
-                location.save()
         location_serializer = LocationSerializer(
-            Location.objects.all().order_by('city'),
-            many=True
+            self.get_queryset().order_by('city'),
+            many=True,
+            context=self.get_serializer_context()
         )
         return Response(location_serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['get'])
+    def history(self, request, *args, **kwargs):
+        """
+        returns the temperature of the Location over time, aggregated by
+        bucket (hour or day) between the from and to unix timestamps,
+        the last 7 days by default
+        """
+        data = request.query_params
+        bucket = data.get('bucket', 'hour')
+        if not bucket in BUCKET_SIZES:
+            raise serializers.ValidationError('bucket must be hour or day')
+        try:
+            until = timezone.now()
+            if 'to' in data:
+                until = unix_to_utc(int(data['to']))
+            since = until - datetime.timedelta(days=7)
+            if 'from' in data:
+                since = unix_to_utc(int(data['from']))
+        except (ValueError, OverflowError, OSError):
+            raise serializers.ValidationError(
+                'from and to must be unix timestamps'
+            )
+        if since >= until:
+            raise serializers.ValidationError('from must be before to')
+
+        location = get_object_or_404(Location, pk=kwargs['pk'])
+        history_data = location_history(location, since, until, bucket)
+        return Response(history_data, status=status.HTTP_200_OK)
+
 
 class WeatherViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.GenericViewSet):
     """
     Viewset for listing weathers and current weather with forecast
     """
+    pagination_class = WeatherPagination
 
     def get_queryset(self):
-        return Weather.objects.all().order_by('-unix_last_update')
+        queryset = Weather.objects.select_related('payload')
+        if self.action == 'list':
+            names = WeatherSerializer.sparse_field_names(
+                self.request.query_params
+            )
+            queryset = WeatherSerializer.sparse_queryset(
+                queryset,
+                names,
+                extra=('unix_last_update',)
+            )
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -228,19 +213,12 @@ class WeatherViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.Ge
         weather_serializer = WeatherSerializer(weather)
         return Response(weather_serializer.data, status=status.HTTP_201_CREATED)
 
-    def unix_to_utc(self, timestamp):
-        """
-        Converts timestamp into utc datetime
-        """
-        from_zone = tz.tzutc()
-        dt = datetime.datetime.utcfromtimestamp(timestamp)
-        dt = dt.replace(tzinfo=from_zone)
-        return dt
-
     @action(detail=False, methods=['get'])
     def current_weather(self, request, *args, **kwargs):
         """
-        gets current weather from weather Api adding 2 conditions:
+        gets current weather of the grid cell of lat, lon from the cache,
+        from the nearest Location with a recent reading (flagged as derived)
+        or from weather Api adding 2 conditions:
             - if there is a Weather object with the same timestamp of the requests
               returns that without creating a new Object
             - if there is a Weather object with the same timestamp of the new Api
@@ -248,72 +226,78 @@ class WeatherViewSet(mixins.ListModelMixin, mixins.CreateModelMixin, viewsets.Ge
             - else creates a new object
         """
         data = request.query_params
-        if not 'lat' in data or not 'lon' in data:
-            raise serializers.ValidationError('missing lat, lon params')
+        validate_coordinates_data(data)
+        cell = get_cell(data['lat'], data['lon'])
 
-        dt = self.unix_to_utc(int(data['dt']))
-        pnt = GEOSGeometry('POINT({} {})'.format(
-            data['lon'], data['lat']),
-            srid=4326
-        )
-        stored_weathers = Weather.objects.filter(
-            unix_last_update=dt,
-            coordinates__dwithin=(pnt, 20)
-        )
-        if stored_weathers.exists():
-            weather = stored_weathers.first()
-            weather_serializer = WeatherSerializer(weather)
-            return Response(weather_serializer.data, status.HTTP_200_OK)
-
-        lat = data['lat']
-        lon = data['lon']
-        url = LOCATION_BY_COORD_API.format(lat, lon, API_KEY)
-        response = requests.get(url)
-        response_data = response.json()
-
-        dt = self.unix_to_utc(response_data['dt'])
-        second_weather_filter = Weather.objects.filter(
-            unix_last_update=dt,
-            coordinates__dwithin=(pnt, 20)
-        )
-        if second_weather_filter.exists():
-            weather = second_weather_filter.first()
-            weather_serializer = WeatherSerializer(weather)
-            return Response(weather_serializer.data, status.HTTP_200_OK)
+        def fetch_weather():
+            weather_data = find_cell_weather(data)
+            if weather_data is None:
+                response_data = get_json(current_weather_url(cell))
+                weather_data = store_current_weather(data, response_data)
+            return weather_data
 
-        serializer = CreateWeatherSerializer(data={"raw_data": response_data})
-        serializer.is_valid()
-        weather = serializer.save()
-        weather_serializer = WeatherSerializer(weather)
-        return Response(weather_serializer.data, status=status.HTTP_200_OK)
+        weather_data = cached_cell_weather(cell, fetch_weather)
+        return Response(weather_data, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['get'])
     def forecast_weather(self, request, *args, **kwargs):
+        """
+        gets the forecast of the grid cell of lat, lon from the cache, from
+        the stored Forecasts or from weather Api storing a new Forecast
+        """
+        data = request.query_params
+        validate_coordinates_data(data)
+        cell = get_cell(data['lat'], data['lon'])
+
+        def fetch_forecast():
+            forecast_data = find_forecast(cell)
+            if forecast_data is None:
+                response_data = get_json(forecast_url(cell))
+                forecast_data = store_forecast(cell, response_data)
+            return forecast_data
+
+        forecast_data = cached_cell_weather(cell, fetch_forecast, FORECAST)
+        return Response(forecast_data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def overview(self, request, *args, **kwargs):
+        """
+        gets current weather and forecast of the grid cell of lat, lon, the
+        stored ones are used when available, else both are stored from a
+        single weather Api forecast request. The current weather is requested
+        by coordinates when the forecast has none or no place name is known,
+        answers 502 if the weather Api fails
+        """
         data = request.query_params
-        if not 'lat' in data or not 'lon' in data:
-            raise serializers.ValidationError('missing lat,lon params')
-
-        lat = data['lat']
-        lon = data['lon']
-        url = FORECAST_BY_COORD_API.format(lat, lon, API_KEY)
-        response = requests.get(url)
-        response_data = response.json()
-        return_data = None
-        if not 'cod' in response_data == 200:
-            return_data = []
-            for forecast in response_data['daily'][1:6]:
-                dt = self.unix_to_utc(forecast['dt'])
-                unix_last_update = dt
-                temperature = forecast['temp']['day'] - 273.15
-                condition = None
-                if len(forecast['weather']) > 0:
-                    condition = "{} ({})".format(
-                        forecast['weather'][0]['main'],
-                        forecast['weather'][0]['description']
-                    )
-                return_data.append({
-                    'unix_last_update': unix_last_update,
-                    'temperature': temperature,
-                    'condition': condition
-                })
-        return Response(return_data, status=status.HTTP_200_OK)
+        validate_coordinates_data(data)
+        cell = get_cell(data['lat'], data['lon'])
+
+        def fetch_overview():
+            weather_data, forecast_data = find_overview(data, cell)
+            if weather_data is None or forecast_data is None:
+                response_data = get_json(forecast_url(cell))
+                weather_data, forecast_data = store_overview(
+                    data,
+                    cell,
+                    weather_data,
+                    forecast_data,
+                    response_data
+                )
+            if weather_data is None:
+                response_data = get_json(current_weather_url(cell))
+                weather_data = store_cell_weather(data, cell, response_data)
+            # incomplete overviews are not cached
+            if weather_data is None or forecast_data is None:
+                return None
+            return {
+                'current_weather': weather_data,
+                'forecast_weather': forecast_data
+            }
+
+        overview_data = cached_cell_weather(cell, fetch_overview, OVERVIEW)
+        if overview_data is None:
+            return Response(
+                {'detail': 'weather API unavailable'},
+                status=status.HTTP_502_BAD_GATEWAY
+            )
+        return Response(overview_data, status=status.HTTP_200_OK)
@@ -0,0 +1,132 @@
+"""
+Shared client for the openweathermap API
+
+Every request goes through a pooled session of the process, so connections
+are kept alive and reused, with connect/read timeouts and retries with
+jittered backoff on 429 and 5xx responses. Async views use an httpx client
+with the same policy. The refresh engine uses a session without retries,
+so a slow city can't stall its batch
+"""
+import asyncio
+import random
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from django.conf import settings
+
+# ENV data
+import environ
+env = environ.Env()
+environ.Env.read_env()
+API_KEY = env('WEATHER_API_KEY')
+LOCATION_BY_PLACE_API = env('LOCATION_BY_PLACE_API')
+LOCATION_BY_COORD_API = env('LOCATION_BY_COORD_API')
+FORECAST_BY_COORD_API = env('FORECAST_BY_COORD_API')
+LOCATION_BY_GROUP_API = env(
+    'LOCATION_BY_GROUP_API',
+    default='https://api.openweathermap.org/data/2.5/group?id={}&appid={}'
+)
+
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+
+class JitteredRetry(Retry):
+    """
+    Retry whose backoff time is randomized, so clients retrying at the same
+    time do not hit the API together again
+    """
+
+    def get_backoff_time(self):
+        backoff_time = super().get_backoff_time()
+        return random.uniform(0, backoff_time)
+
+
+def build_session(retries):
+    """
+    Returns a session with a connection pool and a retry policy of up to
+    retries retries
+    """
+    retry = JitteredRetry(
+        total=retries,
+        backoff_factor=settings.WEATHER_API_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.WEATHER_API_POOL_SIZE,
+        pool_maxsize=settings.WEATHER_API_POOL_SIZE,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+session = build_session(settings.WEATHER_API_RETRIES)
+# session of the refresh engine, its timeout bounds the whole request of a
+# location and failed locations are retried by the next refresh
+batch_session = build_session(0)
+
+
+def get_json(url, timeout=None, retry=True):
+    """
+    Requests url and returns the response content as json, without
+    retries if retry is False
+    """
+    if timeout is None:
+        timeout = (
+            settings.WEATHER_API_CONNECT_TIMEOUT,
+            settings.WEATHER_API_READ_TIMEOUT
+        )
+    if retry:
+        response = session.get(url, timeout=timeout)
+    else:
+        response = batch_session.get(url, timeout=timeout)
+    return response.json()
+
+
+async_client = None
+
+
+def get_async_client():
+    """
+    Returns the async client of the process, created on first use so it
+    belongs to the running event loop
+    """
+    global async_client
+    if async_client is None:
+        async_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.WEATHER_API_ASYNC_POOL_SIZE,
+                max_keepalive_connections=settings.WEATHER_API_ASYNC_POOL_SIZE
+            ),
+            timeout=httpx.Timeout(
+                settings.WEATHER_API_READ_TIMEOUT,
+                connect=settings.WEATHER_API_CONNECT_TIMEOUT
+            )
+        )
+    return async_client
+
+
+async def async_get_json(url):
+    """
+    Requests url without blocking the event loop and returns the response
+    content as json
+    """
+    client = get_async_client()
+    retries = settings.WEATHER_API_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            response = await client.get(url)
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response.json()
+        backoff_time = settings.WEATHER_API_BACKOFF * (2 ** attempt)
+        await asyncio.sleep(random.uniform(0, backoff_time))
@@ -9,8 +9,7 @@ import LocationsList from './components/LocationsList/LocationsList.js'
 
 const ALL_COUNTRIES_API = 'http://0.0.0.0:8000/api/v1/countries/'
 const LOCATIONS_WEATHER_API = 'http://0.0.0.0:8000/api/v1/locations/update_weather/'
-const MY_WEATHER_API = 'http://0.0.0.0:8000/api/v1/weathers/current_weather/'
-const MY_FORECAST_API = 'http://0.0.0.0:8000/api/v1/weathers/forecast_weather/'
+const MY_WEATHER_OVERVIEW_API = 'http://0.0.0.0:8000/api/v1/weathers/overview/'
 
 class App extends Component {
   state = {
@@ -38,14 +37,7 @@ class App extends Component {
     returns all locations weather from API
   */
   getLocationsWeather = async () => {
-    const locationsWeatherData = await axios.get(
-      LOCATIONS_WEATHER_API,
-      {
-        params : {
-          dt: Math.floor(new Date().getTime() / 1000)
-        }
-      }
-    )
+    const locationsWeatherData = await axios.get(LOCATIONS_WEATHER_API)
     let locationsWeatherInfo = null
     if (locationsWeatherData && locationsWeatherData.status === 200) {
       locationsWeatherInfo = locationsWeatherData.data
@@ -55,39 +47,34 @@ class App extends Component {
 
   /**
     - callback function when getcurrentPosition successes
-      - gets current location weather from API
-      - gets current location forecast from API
+      - gets current location weather and forecast from API
   */
   currentPositionSuccess = async (pos) => {
     const coord = pos.coords;
 
-    const currentWeatherData = await axios.get(
-      MY_WEATHER_API,
-      {
-        params : {
-          lat: coord.latitude,
-          lon: coord.longitude,
-          dt: Math.floor(new Date().getTime() / 1000)
+    let overviewData = null
+    try {
+      overviewData = await axios.get(
+        MY_WEATHER_OVERVIEW_API,
+        {
+          params : {
+            lat: coord.latitude,
+            lon: coord.longitude,
+          }
         }
-      }
-    )
-    let currentLocationWeatherInfo = null
-    if (currentWeatherData && currentWeatherData.status === 200) {
-      currentLocationWeatherInfo = currentWeatherData.data
+      )
+    } catch (err) {
+      this.currentPositionError({
+        code: err.response ? err.response.status : err.code,
+        message: err.message
+      })
+      return
     }
-
-    const currentWeatherForecastData = await axios.get(
-      MY_FORECAST_API,
-      {
-        params : {
-          lat: coord.latitude,
-          lon: coord.longitude,
-        }
-      }
-    )
+    let currentLocationWeatherInfo = null
     let currentLocationForecastInfo = null
-    if (currentWeatherForecastData && currentWeatherForecastData.status === 200) {
-      currentLocationForecastInfo = currentWeatherForecastData.data
+    if (overviewData && overviewData.status === 200) {
+      currentLocationWeatherInfo = overviewData.data.current_weather
+      currentLocationForecastInfo = overviewData.data.forecast_weather
     }
 
     this.setState({
@@ -79,6 +79,9 @@ export default class LocationsList extends Component {
     let classifiedLocations = Array.from(Array(tempIntervals.length), () => [])
     for (const locationWeather of locationsWeatherInfo) {
       const {city, country, last_weather_reading} = locationWeather
+      if (!last_weather_reading) {
+        continue;
+      }
       const data = {
         fullName: `${city}, ${country.name} (${country.code})`,
         temperature: Math.round(last_weather_reading.temperature),